@@ -0,0 +1,61 @@
+"""
+Benchmark of the deflation operator in hgdl.local_methods.bump_function.
+
+Compares the batched deflation_kernel with a per-bump Python loop over b and
+b_grad for growing numbers of deflated optima.
+
+usage: python benchmarks/deflation_kernel.py [--dim 10] [--max-points 100000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from hgdl.local_methods import bump_function as defl
+
+
+def loop_reference(x, x_defl, radius):
+    s1 = 0.0
+    s2 = np.zeros((len(x)))
+    for i in range(len(x_defl)):
+        s1 += defl.b(x, x_defl[i], radius[i])
+        s2 += defl.b_grad(x, x_defl[i], radius[i])
+    if s1 == 1.0: s1 = 0.99999
+    return 1.0 / (1.0 - s1), s2 / ((1.0 - s1) ** 2)
+
+
+def time_call(f, *args, repeats=5):
+    best = np.inf
+    for _ in range(repeats):
+        t = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=10)
+    parser.add_argument("--max-points", type=int, default=100000)
+    parser.add_argument("--loop-limit", type=int, default=10000,
+                        help="largest deflation set for which the Python loop is timed")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-1., 1., args.dim)
+    print(f"{'points':>10} {'kernel [s]':>12} {'loop [s]':>12} {'speedup':>10}")
+    m = 10
+    while m <= args.max_points:
+        x_defl = rng.uniform(-1., 1., (m, args.dim))
+        radius = rng.uniform(0.1, 1.0, m)
+        t_kernel = time_call(defl.deflation_kernel, x, x_defl, radius)
+        if m <= args.loop_limit:
+            t_loop = time_call(loop_reference, x, x_defl, radius, repeats=1)
+            print(f"{m:>10} {t_kernel:>12.3e} {t_loop:>12.3e} {t_loop / t_kernel:>10.1f}")
+        else:
+            print(f"{m:>10} {t_kernel:>12.3e} {'-':>12} {'-':>10}")
+        m *= 10
+
+
+if __name__ == "__main__":
+    main()
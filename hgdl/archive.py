@@ -0,0 +1,139 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class point_archive:
+    """
+    ring buffer of the most recent points evaluated by the walkers
+    and their function values; the oldest points are overwritten first
+
+    input:
+    -----
+        dim ... the dimensionality of the space
+        size ... the number of points kept
+        dtype ... the floating point type the points are stored in
+    """
+
+    def __init__(self, dim, size, dtype=np.float64):
+        self.dim = dim
+        self.size = int(size)
+        self.dtype = np.dtype(dtype)
+        self._x = np.empty((self.size, dim), dtype=self.dtype)
+        self._f = np.empty((self.size), dtype=self.dtype)
+        self.count = 0
+        self.version = 0
+        self._tree = None
+        self._tree_version = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tree"], state["_tree_version"] = None, None
+        return state
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def add(self, x, f):
+        """
+        input:
+        -----
+            x ... 2d numpy array (N x D) of positions
+            f ... 1d numpy array (N) of function values
+        """
+        x = np.asarray(x).reshape(-1, self.dim)[-self.size:]
+        f = np.asarray(f).reshape(-1)[-self.size:]
+        if len(f) == 0: return
+        indices = (self.count + np.arange(len(f))) % self.size
+        self._x[indices], self._f[indices] = x, f
+        self.count += len(f)
+        self.version += 1
+
+    def explored(self, x, radius):
+        """
+        returns a boolean array telling which of the points x (N x D)
+        are closer than radius to an archived point
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        if len(self) == 0: return np.zeros((len(x)), dtype=bool)
+        if self._tree_version != self.version:
+            self._tree, self._tree_version = cKDTree(self.x), self.version
+        return np.isfinite(self._tree.query(x, distance_upper_bound=radius)[0])
+
+    @property
+    def x(self):
+        return self._x[0:len(self)]
+
+    @property
+    def f(self):
+        return self._f[0:len(self)]
+
+
+###########################################################################
+class trajectory_recorder:
+    """
+    records the points at which the walkers of a task evaluate the function,
+    downsampled to at most size points: when the record is full every
+    other point is dropped and only every (2 x stride)-th evaluation is kept.
+    Positions can also be recorded without a value (e.g. the iterates of
+    dNewton, which evaluates the function only at its result); complete()
+    evaluates the function at the ones that are kept.
+    """
+
+    def __init__(self, size):
+        self.size = max(int(size), 2)
+        self.stride = 1
+        self.count = 0
+        self._x, self._f = [], []
+
+    def add(self, x, f=None):
+        x = np.atleast_2d(x)
+        f = np.full((len(x)), np.nan) if f is None else np.atleast_1d(f)
+        for i in range(len(f)):
+            if self.count % self.stride == 0:
+                self._x.append(np.array(x[i], dtype=float))
+                self._f.append(float(f[i]))
+                if len(self._f) >= self.size:
+                    self._x, self._f = self._x[::2], self._f[::2]
+                    self.stride *= 2
+            self.count += 1
+
+    def wrap(self, function):
+        """
+        returns function (value at x) recording its evaluations
+        """
+        def recorded(x, *args):
+            f = function(x, *args)
+            self.add(x, f)
+            return f
+        return recorded
+
+    def wrap_fused(self, function):
+        """
+        returns function (value and gradient at x) recording its evaluations
+        """
+        def recorded(x, *args):
+            f, g = function(x, *args)
+            self.add(x, f)
+            return f, g
+        return recorded
+
+    def complete(self, function, vectorized=False, *args):
+        """
+        evaluates function at the kept positions recorded without a value;
+        vectorized functions are called once with all of them
+        """
+        known = {x.tobytes(): f for x, f in zip(self._x, self._f) if not np.isnan(f)}
+        for i, x in enumerate(self._x):
+            if np.isnan(self._f[i]): self._f[i] = known.get(x.tobytes(), np.nan)
+        missing = [i for i, f in enumerate(self._f) if np.isnan(f)]
+        if not missing: return
+        x = np.array([self._x[i] for i in missing])
+        if vectorized: f = function(x, *args)
+        else: f = [function(point, *args) for point in x]
+        for i, value in zip(missing, np.reshape(f, (-1))): self._f[i] = float(value)
+
+    def samples(self, dim, dtype=np.float64):
+        """
+        returns the recorded positions (N x D) and function values (N) as arrays of dtype
+        """
+        return np.reshape(self._x, (-1, dim)).astype(dtype), np.array(self._f, dtype=dtype)
@@ -0,0 +1,201 @@
+"""
+Benchmark suite of HGDL on multimodal test functions with known optima.
+
+Every combination of test function, dimensionality, local optimizer and global
+optimizer is run once. The wall time, the number of function and gradient
+evaluations (including those of the finite difference Hessian), the time until
+k of the known minima were found and the recall of the known minima are written as one JSON object per run to a
+JSON lines file, so that the results of two releases can be compared.
+
+usage: hgdl-benchmark [--functions schwefel rastrigin] [--dims 2 3]
+                      [--local-optimizers L-BFGS-B dNewton] [--global-optimizers genetic]
+                      [--epochs 10] [--walkers 8] [--output benchmark.jsonl]
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+
+import numpy as np
+from scipy.optimize import minimize, minimize_scalar, rosen, rosen_der
+
+from . import support_functions as sf
+from .hgdl import HGDL
+
+
+class benchmark_problem:
+    """
+    a test function with its gradient, its domain and its known minima
+
+    input:
+    -----
+        func, grad ... callables accepting a point (D)
+        bounds ... (lower, upper) bound of every coordinate
+        f1 ... for separable functions f(x) = sum(f1(x_i)), the one-dimensional
+               term; the known minima are then all combinations of its minima
+        minima ... for other functions a callable returning the known minima (K x D) for D
+    """
+
+    def __init__(self, func, grad, bounds, f1=None, minima=None):
+        self.func = func
+        self.grad = grad
+        self.bounds = bounds
+        self.f1 = f1
+        self.minima = minima
+
+    def domain(self, dim):
+        return np.array([self.bounds] * dim, dtype=float)
+
+    def known_minima(self, dim, max_number=100):
+        """
+        returns the (at most max_number) lowest known minima (K x D) and their function values (K)
+        """
+        if self.f1 is None: x = self.minima(dim)
+        else:
+            x1 = _minima_1d(self.f1, self.bounds)
+            if len(x1) ** dim > 10 ** 5: x1 = x1[np.argsort(self.f1(x1))][0:1]
+            x = np.array(list(itertools.product(x1, repeat=dim)))
+        f = np.array([self.func(point) for point in x])
+        order = np.argsort(f)[0:max_number]
+        return x[order], f[order]
+
+
+def _minima_1d(f1, bounds, n=20001):
+    grid = np.linspace(bounds[0], bounds[1], n)
+    y = f1(grid)
+    indices = np.where((y[1:-1] < y[0:-2]) & (y[1:-1] < y[2:]))[0] + 1
+    return np.array([minimize_scalar(f1, bounds=(grid[i - 1], grid[i + 1]), method="bounded",
+                                     options={"xatol": 1e-10}).x for i in indices])
+
+
+def _rosenbrock_minima(dim):
+    minima = [np.ones(dim)]
+    # for 4 <= D <= 7 there is a second local minimum close to (-1, 1, ..., 1)
+    if 4 <= dim <= 7: minima.append(minimize(rosen, np.r_[-1.0, np.ones(dim - 1)], jac=rosen_der, tol=1e-12).x)
+    return np.array(minima)
+
+
+problems = {
+    "schwefel": benchmark_problem(sf.schwefel, sf.schwefel_gradient, (-500.0, 500.0),
+                             f1=lambda x: 418.9829 - x * np.sin(np.sqrt(np.abs(x)))),
+    "rastrigin": benchmark_problem(sf.rastrigin, sf.rastrigin_gradient, (-5.12, 5.12),
+                              f1=lambda x: 10.0 + x ** 2 - 10.0 * np.cos(2.0 * np.pi * x)),
+    "ackley": benchmark_problem(sf.ackley, sf.ackley_gradient, (-5.0, 5.0), minima=lambda dim: np.zeros((1, dim))),
+    "rosenbrock": benchmark_problem(rosen, rosen_der, (-2.0, 2.0), minima=_rosenbrock_minima),
+    "styblinski-tang": benchmark_problem(sf.styblinski_tang, sf.styblinski_tang_gradient, (-5.0, 5.0),
+                                    f1=lambda x: 0.5 * (x ** 4 - 16.0 * x ** 2 + 5.0 * x)),
+}
+
+
+###########################################################################
+class counted:
+    """
+    counts the calls of a callable (within the current process)
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, x, *args):
+        with self._lock: self.calls += 1
+        return self.function(x, *args)
+
+
+def recall(found, known, tolerance):
+    """
+    returns a boolean array (K) telling which known minima are
+    closer than tolerance to one of the found optima (N x D)
+    """
+    if len(found) == 0: return np.zeros((len(known)), dtype=bool)
+    distances = np.linalg.norm(known[:, None, :] - found[None, :, :], axis=2)
+    return np.min(distances, axis=1) < tolerance
+
+
+###########################################################################
+def run_benchmark(name, dim, local_optimizer="L-BFGS-B", global_optimizer="genetic", num_epochs=10,
+                  number_of_walkers=8, executor="threads", k=(1, 5, 10), poll_interval=0.05, max_known=100):
+    """
+    runs HGDL once on the test problem `name` and returns the results as a dictionary.
+    The evaluation counts are only available if the walkers run in
+    the current process (executor="threads"), otherwise they are None.
+    """
+    problem = problems[name]
+    bounds = problem.domain(dim)
+    known_x, known_f = problem.known_minima(dim, max_known)
+    tolerance = 1e-3 * np.linalg.norm(bounds[:, 1] - bounds[:, 0])
+    func, grad = counted(problem.func), counted(problem.grad)
+    a = HGDL(func, grad, bounds, local_optimizer=local_optimizer, global_optimizer=global_optimizer,
+             num_epochs=num_epochs)
+
+    first_found = np.full((len(known_x)), np.inf)
+    start_time = time.perf_counter()
+    a.optimize(executor=executor, number_of_walkers=number_of_walkers)
+    while True:
+        done = a.main_future.done()
+        found = np.array([entry["x"] for entry in a.get_latest() if entry["classifier"] == "minimum"])
+        hits = recall(found.reshape(-1, dim), known_x, tolerance)
+        first_found[hits & np.isinf(first_found)] = time.perf_counter() - start_time
+        if done: break
+        time.sleep(poll_interval)
+    wall_time = time.perf_counter() - start_time
+    optima_list = a.get_final()
+    a.kill_client()
+
+    times = np.sort(first_found)
+    in_process = executor == "threads"
+    return {"function": name, "dim": dim,
+            "local_optimizer": local_optimizer, "global_optimizer": global_optimizer,
+            "num_epochs": num_epochs, "number_of_walkers": number_of_walkers, "executor": executor,
+            "wall_time": wall_time,
+            "func_evaluations": func.calls if in_process else None,
+            "grad_evaluations": grad.calls if in_process else None,
+            "number_of_optima": len(optima_list),
+            "best_f": min((float(entry["f(x)"]) for entry in optima_list), default=None),
+            "global_f": float(known_f[0]),
+            "known_minima": len(known_x),
+            "recall": float(np.mean(np.isfinite(first_found))),
+            "time_to_k_optima": {str(n): (float(times[n - 1]) if n <= len(times) and np.isfinite(times[n - 1])
+                                          else None) for n in k}}
+
+
+###########################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="hgdl-benchmark", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--functions", nargs="+", default=list(problems), choices=list(problems))
+    parser.add_argument("--dims", nargs="+", type=int, default=[2, 3])
+    parser.add_argument("--local-optimizers", nargs="+", default=["L-BFGS-B", "dNewton"])
+    parser.add_argument("--global-optimizers", nargs="+", default=["genetic", "random"])
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--walkers", type=int, default=8)
+    parser.add_argument("--executor", default="threads", choices=["threads", "processes"])
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 5, 10],
+                        help="report the time until k known minima were found")
+    parser.add_argument("--output", default="benchmark.jsonl", help="JSON lines file the results are appended to")
+    args = parser.parse_args(argv)
+
+    print(f"{'function':<16}{'dim':>4}  {'local':<10}{'global':<10}{'time [s]':>9}{'grad evals':>11}{'recall':>8}")
+    with open(args.output, "a") as file:
+        for name, dim, local_optimizer, global_optimizer in itertools.product(
+                args.functions, args.dims, args.local_optimizers, args.global_optimizers):
+            result = run_benchmark(name, dim, local_optimizer, global_optimizer, args.epochs, args.walkers,
+                                   args.executor, args.k)
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            print(f"{name:<16}{dim:>4}  {local_optimizer:<10}{global_optimizer:<10}{result['wall_time']:>9.2f}"
+                  f"{str(result['grad_evaluations']):>11}{result['recall']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
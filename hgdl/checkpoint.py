@@ -0,0 +1,77 @@
+"""
+Checkpoints of a running optimization.
+A checkpoint is an append-only log of pickled records: a header written when
+the optimization starts, the optima stored since the previous write (as
+optima deltas, see optima.get_delta) and the state of the host loop (epoch or
+number of local optimizations, walker positions and the numpy RNG state).
+Every write only appends what changed since the last one. A record cut off
+by a crash is ignored when the log is loaded.
+"""
+import os
+import pickle
+
+import numpy as np
+
+
+class checkpoint:
+    """
+    writes the checkpoint log of the host loop to path
+    (a file system path that is accessible from the host worker);
+    the state is written every interval-th call of save()
+    """
+
+    def __init__(self, path, interval=1):
+        self.path = path
+        self.interval = interval
+        self._deltas = []
+        self._calls = 0
+
+    def start(self, header):
+        """
+        starts a new log with the header (a dictionary)
+        """
+        with open(self.path, "wb") as file: pickle.dump(dict(header, type="header"), file)
+
+    def record(self, delta):
+        """
+        keeps an optima delta until the next write
+        """
+        if delta is not None: self._deltas.append(delta)
+
+    def save(self, state, force=False):
+        """
+        appends the recorded optima deltas and the state (a dictionary)
+        to the log, if this is an interval-th call or force is True;
+        returns whether it was written
+        """
+        self._calls += 1
+        if not force and self._calls % self.interval: return False
+        with open(self.path, "ab") as file:
+            for delta in self._deltas: pickle.dump(dict(delta, type="optima"), file)
+            pickle.dump(dict(state, type="state", rng=np.random.get_state()), file)
+            file.flush()
+            os.fsync(file.fileno())
+        self._deltas = []
+        return True
+
+
+###########################################################################
+def load_checkpoint(path, optima):
+    """
+    replays the checkpoint log at path into an empty optima store
+    return:
+        the header and the last state (None if no state was written yet)
+    """
+    header, state = None, None
+    with open(path, "rb") as file:
+        while True:
+            try:
+                record = pickle.load(file)
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                break
+            kind = record.pop("type")
+            if kind == "header": header = record
+            elif kind == "optima": optima.apply_delta(record)
+            else: state = record
+    if header is None: raise ValueError(f"{path} is not an HGDL checkpoint")
+    return header, state
@@ -0,0 +1,195 @@
+import collections
+import copy
+import threading
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class deflation_index:
+    """
+    spatial index of the deflation points (bump locations and radii)
+
+    Points are added incrementally to preallocated arrays whose capacity grows
+    by doubling. The most recent points are kept in a small buffer that is
+    searched by brute force; full buffers are merged into a logarithmic set of
+    KD-trees (each level at least twice the size of the next), so that insertion
+    and the queries below stay sublinear in the number of points. Every level
+    is searched with the largest radius of its own points.
+    """
+
+    def __init__(self, dim, buffer_size=512):
+        """
+        input:
+        -----
+            dim ... the dimensionality of the space
+            buffer_size ... number of points searched by brute force before they are moved into a tree
+        """
+        self.dim = dim
+        self.buffer_size = buffer_size
+        self.version = 0
+        self.generation = 0
+        self._clear()
+
+    def __len__(self):
+        return self._n
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_x"], state["_r"] = self.x, self.r
+        return state
+
+    @property
+    def x(self):
+        return self._x[0:self._n]
+
+    @property
+    def r(self):
+        return self._r[0:self._n]
+
+    def _clear(self):
+        self._x = np.empty((64, self.dim))
+        self._r = np.empty((64))
+        self._n = 0
+        self._levels = []  # list of (cKDTree, start index, end index, max radius), largest first
+        self._n_tree = 0
+        self._shared = False
+
+    def _reserve(self, size):
+        # snapshots copy the shared arrays before they write to them
+        if size <= len(self._r) and not self._shared: return
+        capacity = max(2 * len(self._r), size)
+        x, r = np.empty((capacity, self.dim)), np.empty((capacity))
+        x[0:self._n], r[0:self._n] = self.x, self.r
+        self._x, self._r = x, r
+        self._shared = False
+
+    def snapshot(self):
+        """
+        returns an index of the current points that shares the arrays and trees
+        with this one; points added to either of them later are not seen by the other
+        """
+        other = copy.copy(self)
+        other._levels = list(self._levels)
+        other._shared = True
+        return other
+
+    ####################################################
+    def add(self, x, r):
+        """
+        adds deflation points
+        input:
+        -----
+            x ... 2d numpy array (N x D) of positions
+            r ... 1d numpy array (N) of radii
+        """
+        x = np.asarray(x, dtype=float).reshape(-1, self.dim)
+        r = np.asarray(r, dtype=float).reshape(-1)
+        if len(r) == 0: return
+        self.version += 1
+        n = self._n + len(r)
+        self._reserve(n)
+        self._x[self._n:n], self._r[self._n:n] = x, r
+        self._n = n
+        if n - self._n_tree >= self.buffer_size: self._merge_buffer()
+
+    def rebuild(self, x, r):
+        """
+        replaces all deflation points, e.g. after optima were removed
+        """
+        self.version += 1
+        self.generation += 1
+        self._clear()
+        self.add(x, r)
+
+    def _merge_buffer(self):
+        start = self._n_tree
+        while self._levels and self._levels[-1][2] - self._levels[-1][1] <= self._n - start:
+            start = self._levels.pop()[1]
+        self._levels.append((cKDTree(self.x[start:]), start, self._n, np.max(self.r[start:])))
+        self._n_tree = self._n
+
+    ####################################################
+    def neighbors(self, x, radius):
+        """
+        returns the indices of all deflation points closer than radius to x
+        """
+        x = np.asarray(x, dtype=float)
+        indices = [start + np.asarray(tree.query_ball_point(x, radius), dtype=int)
+                   for tree, start, end, max_radius in self._levels]
+        diff = self.x[self._n_tree:] - x
+        buffer_indices = np.where(np.einsum("ij,ij->i", diff, diff) < radius ** 2)[0]
+        indices.append(self._n_tree + buffer_indices)
+        return np.concatenate(indices)
+
+    def overlapping(self, x):
+        """
+        returns the indices of all bumps whose support contains x
+        """
+        if self._n == 0: return np.empty((0), dtype=int)
+        x = np.asarray(x, dtype=float)
+        candidates = [start + np.asarray(tree.query_ball_point(x, max_radius), dtype=int)
+                      for tree, start, end, max_radius in self._levels]
+        # the points of the buffer are checked against their own radii below
+        candidates = np.concatenate(candidates + [np.arange(self._n_tree, self._n)])
+        diff = self.x[candidates] - x
+        return candidates[np.einsum("ij,ij->i", diff, diff) < self.r[candidates] ** 2]
+
+    def query(self, x):
+        """
+        returns the positions and radii of all bumps whose support contains x
+        """
+        indices = self.overlapping(x)
+        return self.x[indices], self.r[indices]
+
+    def query_many(self, x):
+        """
+        returns the positions and radii of all bumps whose support contains any of the points x (N x D)
+        """
+        if self._n == 0: return self.x, self.r
+        indices = np.unique(np.concatenate([np.empty((0), dtype=int)] + [self.overlapping(point) for point in x]))
+        return self.x[indices], self.r[indices]
+
+    def in_basin(self, x):
+        """
+        returns True if x lies inside the radius of an existing deflation point
+        """
+        return len(self.overlapping(x)) > 0
+
+    def within(self, x, radius):
+        """
+        returns True if any deflation point is closer than radius to x
+        """
+        if self._n == 0: return False
+        return len(self.neighbors(x, radius)) > 0
+
+
+###########################################################################
+_replicas = collections.OrderedDict()
+_replicas_lock = threading.Lock()
+_max_replicas = 0
+
+
+def replica(key, base_id, base, deltas, max_replicas=64):
+    """
+    returns the deflation index of a walker task from a copy kept in the
+    memory of the worker: the copy of key is started from base (a deflation_index)
+    and the points of the deltas (list of (x, r) tuples appended to base)
+    are added, each only once. The task gets a snapshot of the copy.
+    input:
+    -----
+        key ... the name of the copy (one per run)
+        base_id ... changes whenever a new base is sent
+        max_replicas ... number of copies kept, the least recently used ones are dropped;
+                         the largest number any task asked for holds
+    """
+    global _max_replicas
+    with _replicas_lock:
+        _max_replicas = max(_max_replicas, max_replicas)
+        entry = _replicas.pop(key, None)
+        if entry is None or entry[0] != base_id: entry = [base_id, base.snapshot(), 0]
+        for x, r in deltas[entry[2]:]: entry[1].add(x, r)
+        entry[2] = max(entry[2], len(deltas))
+        _replicas[key] = entry
+        while len(_replicas) > _max_replicas: _replicas.popitem(last=False)
+        return entry[1].snapshot()
@@ -0,0 +1,280 @@
+"""
+Executors run the host loop and the walker tasks of HGDL.
+dask_executor uses a dask.distributed client (with the host loop seceded on a
+worker, in the client process or on a worker of its own); local_executor runs
+everything in the current process with a concurrent.futures pool.
+Both provide the same submit, gather, cancel and publish operations.
+walker_pool shares the workers of one dask client among many HGDL problems.
+"""
+import concurrent.futures
+import copy
+import itertools
+import os
+import queue
+
+import dask.distributed as distributed
+
+# where dask_executor runs the host loop
+HOSTS = ("seceded", "client", "worker")
+
+
+class dask_executor:
+    """
+    runs the walkers on the workers of a dask client and the host loop, depending on host, as
+        "seceded" (default) ... a task on the first worker that secedes from the
+                    worker's thread pool while it waits for the walkers
+        "client" ... a thread of the client process
+        "worker" ... a task that occupies the first worker
+    All workers run walkers, except the first one with host="worker".
+    When unpickled on a worker, the client is looked up with distributed.get_client().
+    Executors of a walker_pool (shared=True) run on the given host worker and walkers
+    instead: walker tasks may run on any of the walkers, get the negative number of
+    the problem's unfinished tasks as priority (see walker_pool) and close() leaves the client open.
+    replicas is the number of deflation sets (one per problem) every worker keeps
+    (see deflation_index.replica).
+    """
+
+    def __init__(self, client=None, host="seceded", host_worker=None, walkers=None, shared=False, replicas=64):
+        if host not in HOSTS: raise ValueError(f"Unknown host {host}; use one of {HOSTS}")
+        self._client = client
+        self.host = host
+        self.host_worker = host_worker
+        self.walkers = walkers
+        self.shared = shared
+        self.replicas = replicas
+        self.in_flight = set()
+        self._thread = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_client"] = None
+        state["_thread"] = None
+        state["in_flight"] = set()
+        return state
+
+    @property
+    def client(self):
+        if self._client is None: self._client = distributed.get_client()
+        return self._client
+
+    def assign_workers(self):
+        workers = self.walkers
+        if workers is None: workers = list(self.client.scheduler_info()["workers"].keys())
+        if not workers: raise Exception("No workers available")
+        if self.host == "client": return {"host": None, "walkers": list(workers)}
+        if self.host == "worker": return {"host": workers[0], "walkers": workers[1:]}
+        return {"host": self.host_worker or workers[0], "walkers": list(workers)}
+
+    def run_host(self, fn, data, worker):
+        # in-process workers (and host="client") would share the client's optima store
+        data = host_data(data)
+        if self.host == "client":
+            if self._thread is None:
+                self._thread = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="hgdl-host")
+            return self._thread.submit(fn, data)
+        # scattering the dictionary itself would name its values by their (shared) keys
+        [data] = self.client.scatter([data], workers=worker, hash=False)
+        if self.host == "seceded": return self.client.submit(_seceded, fn, data, workers=worker, pure=False)
+        return self.client.submit(fn, data, workers=worker)
+
+    def submit(self, fn, *args, worker=None):
+        if not self.shared: return self.client.submit(fn, *args, workers=worker, pure=False)
+        self.in_flight = {future for future in self.in_flight if not future.done()}
+        future = self.client.submit(fn, *args, workers=self.walkers, priority=-len(self.in_flight), pure=False)
+        self.in_flight.add(future)
+        return future
+
+    def broadcast(self, obj, workers):
+        return self.client.scatter(obj, broadcast=True, workers=workers, hash=False)
+
+    def put(self, obj, workers):
+        # sent to one of the workers; the others fetch it when a task needs it
+        [future] = self.client.scatter([obj], workers=workers, hash=False)
+        return future
+
+    def gather(self, futures):
+        return self.client.gather(futures)
+
+    def as_completed(self, futures):
+        return distributed.as_completed(futures)
+
+    def cancel(self, futures):
+        # the host loop of host="client" runs in a concurrent.futures.Future
+        futures = list(futures)
+        for future in futures:
+            if isinstance(future, concurrent.futures.Future): future.cancel()
+        self.client.cancel([future for future in futures if not isinstance(future, concurrent.futures.Future)])
+
+    def variable(self, name):
+        return distributed.Variable(name, self.client)
+
+    def queue(self, name):
+        return distributed.Queue(name, self.client)
+
+    def close(self):
+        if self._thread is not None: self._thread.shutdown(wait=False, cancel_futures=True)
+        if not self.shared: self.client.close()
+
+
+def _seceded(fn, data):
+    # the host loop mostly waits for walkers; it does not need a thread of the worker's pool
+    distributed.secede()
+    return fn(data)
+
+
+###########################################################################
+class walker_pool:
+    """
+    runs many HGDL problems on one dask client at the same time.
+    All workers are walkers shared by all problems; the host loops run
+    seceded on the workers, assigned in turns (host="seceded"), or in threads
+    of the client process (host="client"). Every problem gets its own executor:
+        pool = walker_pool(client)
+        for problem in problems: problem.optimize(executor=pool.executor())
+    A walker task gets the negative number of unfinished tasks of its problem
+    at submission as priority, so the k-th waiting tasks of all problems are
+    equally urgent and the walkers alternate between the problems, no matter
+    how many tasks each problem ran before (equal priorities run in the order
+    of submission). Each running problem thus gets an equal share of the walker
+    tasks; with similar task times (see HGDL's chunk_size="auto") also an
+    equal share of the walkers' time.
+    Every worker keeps a copy of the deflation set of each problem, at least
+    max_problems (default: 64) and never fewer than the executors created so far.
+    """
+
+    def __init__(self, client, host="seceded", max_problems=64):
+        if host not in ("seceded", "client"): raise ValueError("walker_pool runs the host loops seceded or in the client")
+        self.client = client
+        self.host = host
+        self.walkers = list(client.scheduler_info()["workers"].keys())
+        if not self.walkers: raise Exception("No workers available")
+        self.hosts = itertools.cycle(self.walkers)
+        self.max_problems = max_problems
+        self.problems = 0
+
+    def executor(self):
+        """
+        returns the executor of a new problem
+        """
+        self.problems += 1
+        return dask_executor(self.client, host=self.host, host_worker=next(self.hosts), walkers=self.walkers,
+                             shared=True, replicas=max(self.max_problems, self.problems))
+
+    def close(self):
+        self.client.close()
+
+
+###########################################################################
+class local_executor:
+    """
+    runs the host loop in a thread of the current process and the walkers
+    in a concurrent.futures thread pool (default) or process pool.
+    All max_workers workers (default: os.cpu_count()) run walkers.
+    With processes=True, func, grad, hess and args have to be picklable and are
+    sent to the pool with every task.
+    The host loop gets its own copy of the optima store (see host_data), and
+    broadcast and put hand the same object to all walkers, so they may only be
+    given objects the host does not change (e.g. a deflation_index.snapshot()).
+    """
+
+    def __init__(self, max_workers=None, processes=False):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if processes: self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        else: self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                thread_name_prefix="hgdl-walker")
+        self._host = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="hgdl-host")
+        self.replicas = 64
+
+    def assign_workers(self):
+        return {"host": None, "walkers": list(range(self.max_workers))}
+
+    def run_host(self, fn, data, worker):
+        return self._host.submit(fn, host_data(data))
+
+    def submit(self, fn, *args, worker=None):
+        return self.pool.submit(fn, *args)
+
+    def broadcast(self, obj, workers):
+        return obj
+
+    def put(self, obj, workers):
+        return obj
+
+    def gather(self, futures):
+        return [future.result() for future in futures]
+
+    def as_completed(self, futures):
+        return _as_completed(futures)
+
+    def cancel(self, futures):
+        for future in futures: future.cancel()
+
+    def variable(self, name):
+        return _variable()
+
+    def queue(self, name):
+        return _queue()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self._host.shutdown(wait=False, cancel_futures=True)
+
+
+def host_data(data):
+    """
+    returns the data of a host loop with a copy of the optima store, so the
+    client's store is only changed by the published deltas, also if the host
+    runs in the client process
+    """
+    return dict(data, optima=copy.deepcopy(data["optima"]))
+
+
+###########################################################################
+class _as_completed:
+    """
+    iterates over futures in the order they finish; futures can be added while iterating
+    """
+
+    def __init__(self, futures):
+        self.pending = set(futures)
+
+    def add(self, future):
+        self.pending.add(future)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.pending: raise StopIteration
+        done, _ = concurrent.futures.wait(self.pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        future = done.pop()
+        self.pending.remove(future)
+        return future
+
+
+class _variable:
+    def __init__(self):
+        self.value = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class _queue:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def put(self, value):
+        self._queue.put(value)
+
+    def get(self, timeout=None, batch=False):
+        if not batch: return self._queue.get(timeout=timeout)
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
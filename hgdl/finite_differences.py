@@ -0,0 +1,104 @@
+import concurrent.futures
+
+import numpy as np
+
+
+class finite_difference_hessian:
+    """
+    approximates the Hessian by finite differences of the gradient
+
+    All perturbed gradients of a call are evaluated as one batch: with one call of a
+    vectorized gradient, or else with a thread pool of the process the walker runs in.
+
+    input:
+    -----
+        grad ... the gradient callable
+        method ... "forward" (D gradient evaluations plus the gradient at x),
+                   "central" (2D gradient evaluations) or
+                   "complex" (complex-step, D gradient evaluations; grad has to accept complex input)
+        epsilon ... the step size, the defaults are 1e-6, 1e-5 and 1e-20 respectively
+        vectorized ... if True, grad accepts (N x D) arrays and returns (N x D) arrays
+        threads ... number of threads evaluating the perturbed gradients of a non-vectorized grad
+    """
+    default_epsilon = {"forward": 1e-6, "central": 1e-5, "complex": 1e-20}
+
+    def __init__(self, grad, method="forward", epsilon=None, vectorized=False, threads=1):
+        if method not in self.default_epsilon:
+            raise ValueError(f"Unknown finite difference method {method!r}; "
+                             f"the options are {', '.join(self.default_epsilon)}")
+        self.grad = grad
+        self.method = method
+        self.epsilon = self.default_epsilon[method] if epsilon is None else epsilon
+        self.vectorized = vectorized
+        self.threads = threads
+        self._pool = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def __call__(self, x, *args, grad_x=None):
+        """
+        returns the Hessian at x (D), or the Hessians (N x D x D) at x (N x D) if vectorized.
+        grad_x is the gradient at x if the caller has already computed it (used by "forward").
+        """
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 2: return self.hessians(x, *args, grad_x=grad_x)
+        return self.hessians(x[None], *args, grad_x=None if grad_x is None else np.asarray(grad_x)[None])[0]
+
+    def hessians(self, x, *args, grad_x=None):
+        n, dim = x.shape
+        steps = self.epsilon * np.eye(dim)
+        if self.method == "forward":
+            points = (x[:, None, :] + steps).reshape(n * dim, dim)
+            if grad_x is None:
+                gradients = self._evaluate(np.vstack([points, x]), *args)
+                gradients, grad_x = gradients[0:n * dim], gradients[n * dim:]
+            else:
+                gradients = self._evaluate(points, *args)
+            jacobian = (gradients.reshape(n, dim, dim) - np.asarray(grad_x)[:, None, :]) / self.epsilon
+        elif self.method == "central":
+            points = np.concatenate([x[:, None, :] + steps, x[:, None, :] - steps], axis=1).reshape(2 * n * dim, dim)
+            gradients = self._evaluate(points, *args).reshape(n, 2 * dim, dim)
+            jacobian = (gradients[:, 0:dim] - gradients[:, dim:]) / (2.0 * self.epsilon)
+        else:
+            points = (x[:, None, :] + 1j * steps).reshape(n * dim, dim)
+            jacobian = np.imag(self._evaluate(points, *args)).reshape(n, dim, dim) / self.epsilon
+        return 0.5 * (jacobian + np.swapaxes(jacobian, 1, 2))
+
+    def _evaluate(self, points, *args):
+        if self.vectorized: return np.asarray(self.grad(points, *args))
+        if self.threads > 1:
+            if self._pool is None: self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads)
+            return np.array(list(self._pool.map(lambda point: self.grad(point, *args), points)))
+        return np.array([self.grad(point, *args) for point in points])
+
+
+###########################################################################
+class finite_difference_hessp:
+    """
+    approximates Hessian-vector products by a forward difference of the gradient
+    along the vector, without forming the Hessian
+
+    input:
+    -----
+        grad ... the gradient callable, accepting a point (D)
+        epsilon ... the step size along the normalized vector, the default is 1e-6
+    """
+
+    def __init__(self, grad, epsilon=1e-6):
+        self.grad = grad
+        self.epsilon = epsilon
+
+    def __call__(self, x, p, *args, grad_x=None):
+        """
+        returns the product of the Hessian at x with p.
+        grad_x is the gradient at x if the caller has already computed it.
+        """
+        x = np.asarray(x, dtype=float)
+        norm = np.linalg.norm(p)
+        if norm == 0.0: return np.zeros(len(x))
+        if grad_x is None: grad_x = self.grad(x, *args)
+        h = self.epsilon / norm
+        return (np.asarray(self.grad(x + h * np.asarray(p), *args)) - grad_x) / h
@@ -10,12 +10,38 @@ def run_global(x, y, bounds, method, number_of_offspring):
         return genetic_step(x, y, bounds, number_of_offspring)
     elif method == "random":
         return random_step(x, y, bounds, number_of_offspring)
-    elif method is callable:
+    elif callable(method):
         return method(x, y, bounds, number_of_offspring)
     else:
         raise Exception("no global method specified")
 
 
+def new_positions(d, n, defl_index=None):
+    """
+    returns n starting positions (n x D) drawn like the initial population:
+    from the low-discrepancy sampler of the meta data (skipping the
+    deflated regions of defl_index) or uniformly at random
+    """
+    if d.sampler is None: return misc.random_population(d.bounds, n)
+    return d.sampler.sample(n, defl_index)
+
+
+def tabu_filter(d, x0, defl_index=None, max_tries=10):
+    """
+    re-samples the starting positions x0 (N x D) closer than d.tabu_radius
+    to a point of the archive, i.e. in regions earlier walkers explored;
+    positions still in explored regions after max_tries draws are kept
+    """
+    if d.tabu_radius is None or d.archive is None or len(d.archive) == 0: return x0
+    x0 = np.array(x0, dtype=float)
+    tabu = d.archive.explored(x0, d.tabu_radius)
+    for i in range(max_tries):
+        if not tabu.any(): break
+        x0[tabu] = new_positions(d, np.sum(tabu), defl_index)
+        tabu[tabu] = d.archive.explored(x0[tabu], d.tabu_radius)
+    return x0
+
+
 def random_step(x, y, bounds, n):
     offspring = np.random.uniform(low=bounds[:, 0], high=bounds[:, 1], size=(n, len(bounds)))
     return offspring
@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+from scipy.stats import qmc
+
+SEQUENCES = ("sobol", "halton", "lhs")
+
+
+class qmc_sampler:
+    """
+    draws points from a low-discrepancy sequence (scipy.stats.qmc) in the bounds.
+    The sequence is continued from call to call; points inside the radius of
+    a deflated optimum are skipped.
+
+    input:
+    -----
+        bounds ... np.ndarray (D x 2) of the bounds
+        method ... "sobol" (scrambled), "halton" (scrambled) or "lhs" (Latin hypercube)
+        seed ... optional seed of the scrambling
+    """
+
+    def __init__(self, bounds, method, seed=None):
+        if method not in SEQUENCES:
+            raise ValueError(f"Unknown sequence {method!r}; the options are {', '.join(SEQUENCES)}")
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.method = method
+        dim = len(self.bounds)
+        if method == "sobol": self.engine = qmc.Sobol(dim, scramble=True, seed=seed)
+        elif method == "halton": self.engine = qmc.Halton(dim, scramble=True, seed=seed)
+        else: self.engine = qmc.LatinHypercube(dim, seed=seed)
+
+    def draw(self, n):
+        """
+        the next n points of the sequence, scaled to the bounds
+        """
+        with warnings.catch_warnings():
+            # Sobol points keep their balance properties only for powers of 2
+            warnings.simplefilter("ignore", UserWarning)
+            return qmc.scale(self.engine.random(n), self.bounds[:, 0], self.bounds[:, 1])
+
+    def sample(self, n, defl_index=None, max_draws=10):
+        """
+        returns n points (n x D) of the sequence outside the deflated regions
+        of defl_index; after max_draws x n drawn points the remaining
+        points are taken from the sequence without the check
+        """
+        if defl_index is None or len(defl_index) == 0: return self.draw(n)
+        accepted, drawn = [], 0
+        while len(accepted) < n and drawn < max_draws * n:
+            candidates = self.draw(n - len(accepted))
+            drawn += len(candidates)
+            accepted.extend(x for x in candidates if not defl_index.in_basin(x))
+        x = np.reshape(accepted, (-1, len(self.bounds)))
+        if len(x) < n: x = np.vstack([x, self.draw(n - len(x))])
+        return x
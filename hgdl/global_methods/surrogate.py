@@ -0,0 +1,86 @@
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+from scipy.spatial import cKDTree
+
+
+class surrogate_model:
+    """
+    proposes walker starts from a radial basis function interpolant of the
+    points in the archive of evaluated points (see archive.point_archive).
+    Every interpolation uses only the neighbors nearest points, so fitting
+    and evaluating stay cheap for large archives; the model is refit only
+    when the archive changed.
+    New starts minimize the lower confidence bound
+        s(x) - exploration * std(f) * min(1, d(x) / spacing)
+    where s is the interpolant and d(x) the distance to the nearest archived
+    (or already proposed) point; candidates inside the radius of a deflated
+    optimum are skipped.
+
+    input:
+    -----
+        bounds ... np.ndarray (D x 2) of the bounds
+        exploration ... the weight of the distance term
+        neighbors ... the number of points of every local interpolation
+        candidates ... the number of candidates per proposed start
+    """
+
+    def __init__(self, bounds, exploration=1.0, neighbors=50, candidates=100):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.exploration = exploration
+        self.neighbors = neighbors
+        self.candidates = candidates
+        self.version = None
+        self.model = None
+
+    def fit(self, archive):
+        """
+        fits the interpolant to the archive; returns False if it has too few points
+        """
+        if archive.version == self.version: return self.model is not None
+        self.version = archive.version
+        x, indices = np.unique(archive.x, axis=0, return_index=True)
+        f = archive.f[indices]
+        dim = len(self.bounds)
+        self.model = None
+        if len(f) < max(2 * (dim + 1), 8): return False
+        width = self.bounds[:, 1] - self.bounds[:, 0]
+        self.scale = np.std(f) if np.std(f) > 0 else 1.0
+        self.spacing = np.linalg.norm(width) / len(f) ** (1.0 / dim)
+        self.x = x
+        self.f = f
+        self.model = RBFInterpolator(x, f, neighbors=min(self.neighbors, len(f)), kernel="thin_plate_spline",
+                                     smoothing=1e-8 * len(f), degree=1)
+        return True
+
+    def propose(self, archive, n, defl_index=None):
+        """
+        returns up to n starting positions (n x D); fewer (possibly none) if the
+        archive is too small or not enough candidates lie outside the deflated regions
+        """
+        if n == 0 or not self.fit(archive): return np.empty((0, len(self.bounds)))
+        candidates = self._candidates(n * self.candidates)
+        if defl_index is not None and len(defl_index):
+            candidates = candidates[[not defl_index.in_basin(x) for x in candidates]]
+        if len(candidates) == 0: return np.empty((0, len(self.bounds)))
+        value = self.model(candidates)
+        distance = cKDTree(self.x).query(candidates)[0]
+        chosen = []
+        for _ in range(min(n, len(candidates))):
+            acquisition = value - self.exploration * self.scale * np.minimum(1.0, distance / self.spacing)
+            i = np.argmin(acquisition)
+            chosen.append(candidates[i])
+            # the distance term keeps the next proposals away from this one
+            distance = np.minimum(distance, np.linalg.norm(candidates - candidates[i], axis=1))
+            value[i] = np.inf
+        return np.array(chosen)
+
+    def _candidates(self, m):
+        """
+        uniform samples and perturbations of the best archived points
+        """
+        width = self.bounds[:, 1] - self.bounds[:, 0]
+        uniform = np.random.uniform(self.bounds[:, 0], self.bounds[:, 1], size=(m - m // 2, len(self.bounds)))
+        best = self.x[np.argsort(self.f)[0:max(1, m // 20)]]
+        local = best[np.random.randint(len(best), size=m // 2)] + \
+            np.random.normal(scale=0.05 * width, size=(m // 2, len(self.bounds)))
+        return np.vstack([uniform, np.clip(local, self.bounds[:, 0], self.bounds[:, 1])])
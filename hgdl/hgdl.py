@@ -1,3 +1,6 @@
+import asyncio
+import time
+import uuid
 import warnings
 
 import dask.distributed as distributed
@@ -6,9 +9,21 @@ import numpy as np
 from loguru import logger
 
 from . import misc
-from .global_methods.global_optimizer import run_global
-from .local_methods.local_optimizer import run_local
+from .executors import dask_executor, local_executor
+from .finite_differences import finite_difference_hessian, finite_difference_hessp
+from .global_methods.global_optimizer import run_global, new_positions, tabu_filter
+from .global_methods.low_discrepancy import SEQUENCES, qmc_sampler
+from .global_methods.surrogate import surrogate_model
+from .archive import point_archive
+from .checkpoint import checkpoint, load_checkpoint
+from .deflation_index import deflation_index
+from .listener import optima_listener
+from .local_methods.early_abort import abort_value
+from .local_methods.evaluation_cache import value_part, gradient_part
+from .local_methods.local_optimizer import run_local, submit_local_method, collect_local_results, shared_data, \
+    record_samples
 from .meta_data import meta_data
+from .metrics import run_metrics
 from .optima import optima
 
 
@@ -43,20 +58,27 @@ class HGDL:
     func : Callable
         The function to be MINIMIZED. A callable that accepts an np.ndarray and 
         optional arguments, and returns a scalar.
-    grad : Callable
+    grad : Callable or bool
         The gradient of the function to be MINIMIZED. A callable that accepts an
         np.ndarray and optional arguments, and returns a vector
         (np.ndarray) of shape (D), where D is the dimensionality of the space in
         which the
-        optimization takes place.
+        optimization takes place. If True, func returns a tuple of the
+        value and the gradient (scipy's jac=True convention), so both
+        are computed in one call.
     bounds : np.ndarray
         The bounds of the domain; an np.ndarray of shape (D x 2), where D is the
         dimensionality of the space in which the
         optimization takes place. Here D is the dimension of the input domain.
-    hess : Callable, optional
+    hess : Callable or str, optional
         The Hessian of the function to be MINIMIZED. A callable that accepts an 
         np.ndarray and optional arguments, and returns a
-        np.ndarray of shape (D x D). The default value is no-op.
+        np.ndarray of shape (D x D). If not provided, the Hessian is approximated
+        by finite differences of the gradient; a string selects the scheme:
+        `forward` (default), `central` or `complex` (complex-step, requires a
+        gradient that accepts complex input). For further options (step size,
+        threads evaluating the gradients) pass an instance of
+        hgdl.finite_differences.finite_difference_hessian.
     num_epochs : int, optional
         The number of epochs the algorithm runs through before being terminated.
         One epoch is the convergence of all local walkers,
@@ -68,7 +90,9 @@ class HGDL:
     global_optimizer : Callable or str, optional
         The function (identified by a string or a Callable) that replaces the 
         fittest walkers after their local convergence.
-        The possible options are `genetic` (default), `random` or a callable that 
+        The possible options are `genetic` (default), `random`, the
+        low-discrepancy sequences `sobol`, `halton` and `lhs` (Latin hypercube;
+        see initial_population), `surrogate` (see archive_size) or a callable that 
         accepts an
         np.ndarray of shape (U x D) of positions, an np.ndarray of shape (U) of 
         function values,
@@ -103,6 +127,138 @@ class HGDL:
         An optional n-tuple of constraint objects.
         The default is no constraints (). Constraints are defined following 
         scipy.optimize.NonlinearConstraint.
+    scheduling : str, optional
+        How the walkers are scheduled. The options are `epoch` (default) and
+        `steady state`. In `epoch` mode all walkers of an epoch have to converge
+        before the global step proposes the next ones. In `steady state` mode
+        every finished walker is added to the optima list right away and
+        the freed worker immediately starts a new walker proposed by the
+        global optimizer, so workers do not wait for the slowest local
+        optimization. In this mode num_epochs x number of walkers
+        local optimizations are run; the first ones are topped up with
+        random starts so that every worker has a task.
+    chunk_size : int or str, optional
+        The number of local optimizations that one walker task runs one after
+        the other. Larger chunks amortize the task overhead for objectives that
+        are cheap to evaluate; each epoch then runs at least chunk_size
+        local optimizations per worker. For `auto` the chunk size is adapted
+        to the measured runtime of the local optimizations so that a task
+        takes about `target_task_time`. The default is 1.
+    target_task_time : float, optional
+        The runtime in seconds of one walker task aimed at by
+        chunk_size="auto". The default is 0.2.
+    vectorized : bool, optional
+        If True, func, grad and hess accept an np.ndarray of shape (N x D) of
+        N points and return an np.ndarray of shape (N), (N x D) and (N x D x D),
+        respectively. The `dNewton` local optimizer then advances all walkers
+        assigned to a worker together in one task; other local optimizers
+        evaluate the callables one point at a time. The default is False.
+    hessp : Callable, optional
+        The product of the Hessian with a vector; a callable that accepts two
+        np.ndarrays x and p of shape (D) (of shape (N x D) if `vectorized`)
+        and optional arguments, and returns an np.ndarray of shape (D)
+        (or (N x D)). Only used with classification="lanczos". If not provided,
+        the products are approximated by finite differences of the gradient.
+    classification : str, optional
+        How the optima are classified and how the deflation radius
+        (1 / smallest eigenvalue) is computed. `dense` (default) computes all
+        eigenvalues of the D x D Hessian. `lanczos` never forms the Hessian and
+        estimates only the smallest and the largest eigenvalue with Lanczos
+        iterations on Hessian-vector products (see hessp); this keeps memory
+        and time per walker linear in D for high-dimensional problems. The
+        stored "Hessian eigvals" then contain the two extreme eigenvalues
+        followed by NaN. Second-order scipy local optimizers (e.g. `Newton-CG`)
+        receive the deflated Hessian-vector products instead of the Hessian.
+    cache_size : int, optional
+        The number of points at which every local optimization keeps the
+        values, gradients and Hessians it has computed, so that repeated
+        requests at the same point (e.g. by the optimizer, the deflation and the
+        classification) do not call the user's callables again. The least
+        recently used points are dropped first; 0 disables the cache.
+        The default is 16.
+    metrics : bool, optional
+        If True, the run records performance metrics (per epoch, per walker
+        task and per local optimization: calls and time of func, grad and
+        hess, iterations, deflation set size, task latencies, transferred
+        bytes, time of the global step and of filling in the optima), which
+        can be queried with hgdl.HGDL.get_metrics(). The default is False.
+    abort_interval : int, optional
+        If given, every abort_interval-th iteration of a local optimization
+        checks whether the walker has entered the radius of a deflated optimum,
+        or stalls at a value worse than the abort_rank-th best stored optimum
+        plus abort_margin. Such walkers are stopped and discarded, which frees
+        their worker for the next starting point. The checks are made in the
+        callback of the scipy local optimizers and of `dNewton` (not for
+        callable local optimizers and vectorized `dNewton`).
+        The default is None (no early aborts).
+    abort_rank : int, optional
+        The rank of the stored optimum the walkers are compared to. The default is 10.
+    abort_margin : float, optional
+        How much worse than the abort_rank-th best optimum a walker has to be
+        to be aborted. The default is 0.
+    abort_stall : float, optional
+        A walker stalls if its function value decreased by less than
+        abort_stall (relative) since the previous check. The default is 1e-3.
+    initial_population : str, optional
+        How the starting positions not given by x0 (and the walkers the global
+        optimizer does not propose) are drawn. The options are `random`
+        (uniform), `sobol` and `halton` (scrambled sequences) and `lhs` (Latin
+        hypercube) of scipy.stats.qmc; the sequences cover the domain more
+        evenly than uniform samples. The sequence is continued from epoch to
+        epoch and points inside the radius of a deflated optimum are skipped.
+        The default is None: the sequence of the global optimizer if it is
+        one of them, `random` otherwise.
+    archive_size : int, optional
+        With global_optimizer="surrogate" or a tabu_radius the walkers return
+        a downsampled record of the points they evaluated (at most
+        samples_per_walker per local optimization; for dNewton its iterates,
+        whose values are computed for the kept points), which the host keeps in
+        an archive of the archive_size most recent points.
+        With global_optimizer="surrogate", between epochs a local radial basis
+        function interpolant of the archive is (re)fit and the new walkers start
+        where its lower confidence bound is smallest, outside the radii of the
+        deflated optima. This pays off for objectives that are expensive to
+        evaluate. The default is 4096.
+    samples_per_walker : int, optional
+        See archive_size. The default is 32.
+    archive_dtype : str or numpy.dtype, optional
+        The floating point type the walkers return the recorded points in and
+        the archive stores them in; `float32` halves the transfers and the
+        memory of the archive. The default is `float64`.
+    tabu_radius : float, optional
+        If given, new walkers starting closer than tabu_radius to an archived
+        point (see archive_size), i.e. in a region earlier walkers
+        already explored, are re-sampled like the initial population before
+        they are submitted. The default is None (no tabu filter).
+    newton_line_search : bool, optional
+        If True, the steps of the `dNewton` local optimizer are damped by a
+        backtracking line search on |gradient|^2 (of the deflated gradient), so
+        walkers starting far from a critical point converge in fewer
+        iterations instead of being thrown around by full Newton steps.
+        The default is False (full Newton steps).
+    tolerance_schedule : Callable or sequence, optional
+        The tolerance of the local optimizers in every epoch (in `steady state`
+        mode: window of number of walkers local optimizations); a callable
+        accepting the epoch (starting at 0) or a sequence of the tolerances of
+        the first epochs. Where the schedule ends or is None, the tolerance of
+        optimize() is used. A loose tolerance in the first epochs, which mostly
+        map out the basins, saves iterations on walkers that turn out to be
+        duplicates. The default is None (the tolerance of optimize() in all epochs).
+    max_iter_schedule : Callable or sequence, optional
+        The iteration limit of the local optimizers in every epoch, like
+        tolerance_schedule; local_max_iter is used where it ends.
+        The default is None.
+    refine : bool, optional
+        If True, the results of epochs with a looser tolerance or a lower
+        iteration limit than the final ones are classified as minima if the
+        Hessian is positive definite (regardless of the gradient), duplicates
+        are removed, and only the accepted ones are polished with the final
+        tolerance and iteration limit before they are stored. If False, the
+        results of such epochs are stored as they are. The default is True.
+    surrogate_exploration : float, optional
+        The weight of the distance to the archived points in the lower confidence
+        bound of the `surrogate` global optimizer (in standard deviations of the
+        archived function values); larger values explore more. The default is 1.
 
     Attributes
     ----------
@@ -120,28 +276,95 @@ class HGDL:
                  number_of_optima=1000000,
                  local_max_iter=1000,
                  constraints=(),
-                 args=()):
+                 args=(),
+                 scheduling="epoch",
+                 chunk_size=1,
+                 target_task_time=0.2,
+                 vectorized=False,
+                 hessp=None,
+                 classification="dense",
+                 cache_size=16,
+                 metrics=False,
+                 abort_interval=None,
+                 abort_rank=10,
+                 abort_margin=0.0,
+                 abort_stall=1e-3,
+                 initial_population=None,
+                 archive_size=4096,
+                 samples_per_walker=32,
+                 surrogate_exploration=1.0,
+                 archive_dtype="float64",
+                 tabu_radius=None,
+                 newton_line_search=False,
+                 tolerance_schedule=None,
+                 max_iter_schedule=None,
+                 refine=True):
         bounds = np.asarray(bounds)
         self.dim = len(bounds)
         self.bounds = bounds
+        self.fun_and_grad = None
+        if grad is True:
+            self.fun_and_grad = func
+            func, grad = value_part(func), gradient_part(func)
         self.func = func
         self.grad = grad
-        if hess:
-            self.hess = hess
+        self.cache_size = cache_size
+        self.metrics = metrics
+        self._metrics = run_metrics()
+        self.abort_interval = abort_interval
+        self.abort_rank = abort_rank
+        self.abort_margin = abort_margin
+        self.abort_stall = abort_stall
+        self._listener = None
+        if hess is None or isinstance(hess, str):
+            self.hess = finite_difference_hessian(grad, method=hess or "forward", vectorized=vectorized)
         else:
-            self.hess = self.hess_approx
+            self.hess = hess
+        if classification not in ("dense", "lanczos"):
+            raise ValueError(f"Unknown classification {classification!r}; the options are 'dense' and 'lanczos'")
+        self.classification = classification
+        self.hessp = hessp
+        # with vectorized callables the walkers rebuild it on the point-wise gradient
+        if hessp is None and classification == "lanczos": self.hessp = finite_difference_hessp(grad)
         if bounds is not None and local_optimizer == "dNewton":
             warnings.warn("Warning: dNewton will not adhere to bounds. It is recommended to formulate your objective function such that it is defined on R^N by simple non-linear transformations.")
         if constraints:
             local_optimizer = "SLSQP"
             warnings.warn("Constraints provided, local optimizer changed to 'SLSQP'")
+        if scheduling not in ("epoch", "steady state"):
+            raise ValueError(f"Unknown scheduling {scheduling!r}; the options are 'epoch' and 'steady state'")
 
         self.constraints = constraints
         self.local_max_iter = local_max_iter
         self.num_epochs = num_epochs
         self.global_optimizer = global_optimizer
+        if initial_population is None:
+            initial_population = global_optimizer if global_optimizer in SEQUENCES else "random"
+        if initial_population not in ("random",) + SEQUENCES:
+            raise ValueError(f"Unknown initial population {initial_population!r}; "
+                             f"the options are 'random', {', '.join(map(repr, SEQUENCES))}")
+        self.initial_population = initial_population
+        # the sampler continues on the host; it is seeded from np.random for reproducibility
+        sequence = global_optimizer if global_optimizer in SEQUENCES else initial_population
+        self.sampler = None
+        if sequence in SEQUENCES: self.sampler = qmc_sampler(bounds, sequence, seed=np.random.randint(2 ** 31))
+        self.archive, self.surrogate = None, None
+        self.samples_per_walker = samples_per_walker
+        self.tabu_radius = tabu_radius
+        if global_optimizer == "surrogate" or tabu_radius is not None:
+            self.archive = point_archive(self.dim, archive_size, archive_dtype)
+        if global_optimizer == "surrogate": self.surrogate = surrogate_model(bounds, surrogate_exploration)
         self.local_optimizer = local_optimizer
+        self.newton_line_search = newton_line_search
+        self.tolerance_schedule = tolerance_schedule
+        self.max_iter_schedule = max_iter_schedule
+        self.refine = refine
+        self._set_budgets(None, None, None, 10)
         self.args = args
+        self.scheduling = scheduling
+        self.chunk_size = chunk_size
+        self.target_task_time = target_task_time
+        self.vectorized = vectorized
         self.optima = optima(self.dim, number_of_optima)
         logger.debug("HGDL successfully initiated {}")
         if callable(self.hess): logger.debug("Hessian was provided by the user: {}", self.hess)
@@ -153,7 +376,9 @@ class HGDL:
     ###########################################################################
     ###########################################################################
     ###########################################################################
-    def optimize(self, dask_client=None, x0=None, tolerance=1e-10):
+    def optimize(self, dask_client=None, x0=None, tolerance=1e-10, number_of_walkers=None, executor=None,
+                 checkpoint_path=None, checkpoint_interval=1, on_new_optimum=None,
+                 max_time=None, max_evaluations=None, stagnation_epochs=None, stagnation_rank=10):
         """
         Function to start the optimization. Note, this function will not 
         return anything. Use the method hgdl.HGDL.get_latest() 
@@ -173,14 +398,117 @@ class HGDL:
             The default is None, meaning only random points will be used.
         tolerance : float, optional
             The tolerance used by the local optimizers. The default is 1e-6
+        number_of_walkers : int, optional
+            The number of walkers per epoch. The default is the number of
+            walker workers of the dask client. More walkers than workers are
+            useful with `vectorized` callables, where each worker advances
+            its share of the walkers together.
+        executor : str or object, optional
+            Where the optimization runs. The default None uses dask
+            (see dask_client). `threads` or `processes` run the host loop in
+            a thread of the current process and the walkers in a
+            concurrent.futures thread or process pool with one worker per CPU,
+            without starting a dask cluster. An instance of
+            hgdl.executors.local_executor or hgdl.executors.dask_executor
+            can be passed as well, e.g. dask_executor(client, host="client")
+            to run the host loop in a thread of this process instead of
+            seceded on the first worker (all workers run walkers either way).
+            The executors of a hgdl.executors.walker_pool let many HGDL
+            instances share the workers of one dask client.
+        checkpoint_path : str, optional
+            A file the host loop writes checkpoints to, so that the
+            optimization can be continued with hgdl.HGDL.resume() after the
+            client, the scheduler or the job ended. The file has to be
+            accessible from the host loop (see executor). The default is None (no checkpoints).
+        checkpoint_interval : int, optional
+            The number of epochs between checkpoints (in `steady state`
+            mode: of number_of_walkers finished local optimizations).
+            A checkpoint only appends the optima found since the previous one.
+            The default is 1.
+        on_new_optimum : Callable, optional
+            A callable that is called with every new optimum (a dictionary
+            like the entries of the list returned by get_latest()) as soon as
+            the host has stored it. It is called from a background thread of
+            the client, which then also keeps the result of get_latest()
+            up to date. See also hgdl.HGDL.stream(). The default is None.
+        max_time : float, optional
+            A wall-clock budget in seconds of the run. The host checks it
+            between epochs and does not start an epoch that would end after
+            max_time if it took as long as the previous one (in `steady state`
+            mode: after every walker task; running walkers are cancelled).
+            The default is None (no time limit).
+        max_evaluations : int, optional
+            A budget of evaluations of all walkers, checked like max_time:
+            every call of func, grad, hess, hessp or a fused objective counts
+            (for `vectorized` callables every point); finite difference
+            Hessians and Hessian-vector products count the gradients they
+            evaluate, repeated requests served by the cache (cache_size) do not
+            count. The walkers finish their current local optimization, so the
+            budget can be exceeded by the evaluations of one epoch (in
+            `steady state` mode: of the running walkers). The default is None (no limit).
+        stagnation_epochs : int, optional
+            The run stops after stagnation_epochs epochs (in `steady state`
+            mode: windows of number_of_walkers local optimizations) in a row
+            without a new optimum among the stagnation_rank best ones.
+            The default is None (no stagnation rule).
+        stagnation_rank : int, optional
+            See stagnation_epochs. The default is 10.
+
+        The reason the run stopped is returned by hgdl.HGDL.get_stop_reason().
         """
-        client = self._init_dask_client(dask_client)
+        self._set_budgets(max_time, max_evaluations, stagnation_epochs, stagnation_rank)
+        executor = self._init_executor(dask_client, executor)
+        if number_of_walkers is not None: self.number_of_walkers = number_of_walkers
         self.tolerance = tolerance
-        logger.debug(client)
+        logger.debug(executor)
         self.x0 = self._prepare_starting_positions(x0)
         logger.debug("HGDL starts with: {}", self.x0)
         self.meta_data = meta_data(self)
-        self._run_epochs(client)
+        self.checkpoint = None
+        if checkpoint_path is not None:
+            self.checkpoint = checkpoint(checkpoint_path, checkpoint_interval)
+            self.checkpoint.start({"dim": self.dim, "x0": self.x0, "tolerance": tolerance,
+                                   "number_of_walkers": self.number_of_walkers, "scheduling": self.scheduling})
+        self._run_epochs(executor, on_new_optimum=on_new_optimum)
+
+    ###########################################################################
+    def resume(self, checkpoint_path, dask_client=None, executor=None, checkpoint_interval=1, on_new_optimum=None,
+               max_time=None, max_evaluations=None, stagnation_epochs=None, stagnation_rank=10):
+        """
+        Function to continue an optimization from a checkpoint written by
+        hgdl.HGDL.optimize(checkpoint_path=...). HGDL has to be initialized
+        with the same func, grad, bounds and options. The stored optima and
+        deflation points are restored without evaluating the function again;
+        the host loop continues with the epoch (or the walkers) after
+        the last checkpoint and keeps appending to the same file.
+        Like optimize(), this function returns immediately.
+
+        Parameters
+        ----------
+        checkpoint_path : str
+            The checkpoint file.
+        dask_client, executor, on_new_optimum :
+            See hgdl.HGDL.optimize().
+        checkpoint_interval : int, optional
+            See hgdl.HGDL.optimize(). The default is 1.
+        max_time, max_evaluations, stagnation_epochs, stagnation_rank :
+            See hgdl.HGDL.optimize(); the budgets apply to the resumed run.
+        """
+        self._set_budgets(max_time, max_evaluations, stagnation_epochs, stagnation_rank)
+        self.optima = optima(self.dim, self.optima.max_optima)
+        header, state = load_checkpoint(checkpoint_path, self.optima)
+        if header["dim"] != self.dim:
+            raise ValueError(f"The checkpoint is {header['dim']}-dimensional, the problem {self.dim}-dimensional")
+        if header["scheduling"] != self.scheduling:
+            raise ValueError(f"The checkpoint was written with scheduling={header['scheduling']!r}")
+        executor = self._init_executor(dask_client, executor)
+        self.number_of_walkers = header["number_of_walkers"]
+        self.tolerance = header["tolerance"]
+        self.x0 = header["x0"]
+        logger.debug("HGDL resumes with {} optima from {}", len(self.optima), checkpoint_path)
+        self.meta_data = meta_data(self)
+        self.checkpoint = checkpoint(checkpoint_path, checkpoint_interval)
+        self._run_epochs(executor, state, on_new_optimum)
 
     ###########################################################################
     def get_client_info(self):
@@ -193,11 +521,16 @@ class HGDL:
     def get_latest(self):
         """
         Function to request the current result.
+        Only the optima found since the last call are transferred
+        from the host and merged into the local copy.
         No inputs
         """
+        if self._listener is not None:
+            # the listener thread keeps the local copy up to date
+            with self._listener.lock: return self._listener.optima.list
         try:
-            data, frames = self.transfer_data.get()
-            self.optima = distributed.protocol.deserialize(data, frames)
+            for delta in self.transfer_data.get(batch=True):
+                if delta is not None: self.optima.apply_delta(delta)
             logger.debug("HGDL called get_latest() successfully")
         except Exception as err:
             self.optima = self.optima
@@ -205,6 +538,41 @@ class HGDL:
         optima_list = self.optima.list
         return optima_list
 
+    ###########################################################################
+    async def stream(self):
+        """
+        Asynchronous iterator over the new optima, each delivered once
+        (a dictionary like the entries of the list returned by get_latest())
+        as soon as the host has stored it, without polling:
+
+            async for optimum in hgdl.stream(): ...
+
+        The iteration ends when the optimization has finished. Optima
+        already returned by get_latest() before the first call are not repeated.
+        """
+        loop = asyncio.get_running_loop()
+        new_optima = asyncio.Queue()
+        listener = self._get_listener()
+        listener.subscribe(lambda entry: loop.call_soon_threadsafe(new_optima.put_nowait, entry),
+                           lambda: loop.call_soon_threadsafe(new_optima.put_nowait, None))
+        listener.start()
+        while True:
+            entry = await new_optima.get()
+            if entry is None: return
+            yield entry
+
+    ###########################################################################
+    def get_metrics(self):
+        """
+        Function to request the performance metrics recorded so far
+        (HGDL has to be initialized with metrics=True).
+        Returns a dictionary of three tables, "epochs", "tasks" and "walkers",
+        each a dictionary of np.ndarrays (one per column, see hgdl.metrics).
+        """
+        if not self.metrics: raise ValueError("HGDL was initialized with metrics=False")
+        for update in self.metrics_data.get(batch=True): self._metrics.apply(update)
+        return self._metrics.as_arrays()
+
     ###########################################################################
     def get_final(self):
         """
@@ -221,6 +589,15 @@ class HGDL:
         optima_list = self.optima.list
         return optima_list
 
+    ###########################################################################
+    def get_stop_reason(self):
+        """
+        Function to request why the run stopped: `num_epochs` (all epochs
+        done), `max_time`, `max_evaluations`, `stagnation` or `cancelled`
+        (see hgdl.HGDL.optimize()); None while it is running.
+        """
+        return self.stop_reason.get()
+
     ###########################################################################
     def cancel_tasks(self):
         """
@@ -230,8 +607,8 @@ class HGDL:
         logger.debug("HGDL is cancelling all tasks...")
         res = self.get_latest()
         self.break_condition.set(True)
-        self.client.cancel(self.main_future)
-        logger.debug("Status of HGDL task: ", self.main_future.status)
+        self.executor.cancel([self.main_future])
+        logger.debug("Status of HGDL task: ", self.main_future)
         logger.debug("This leaves the client alive.")
         return res
 
@@ -246,8 +623,8 @@ class HGDL:
         res = self.get_latest()
         try:
             self.break_condition.set(True)
-            self.client.cancel(self.main_future)
-            self.client.close()
+            self.executor.cancel([self.main_future])
+            self.executor.close()
             logger.debug("HGDL kill client successful")
         except Exception as err:
             raise RuntimeError("HGDL kill failed") from err
@@ -260,14 +637,14 @@ class HGDL:
         if x0 is not None and len(x0[0]) != self.dim:
             raise Exception("Wrong dimensionality of starting positions")
         elif x0 is None:
-            x0 = misc.random_population(self.bounds, self.number_of_walkers)
+            x0 = self._initial_population(self.number_of_walkers)
         elif x0.ndim == 1:
             x0 = np.array([x0])
 
         if len(x0) < self.number_of_walkers:
             x0_aux = np.zeros((self.number_of_walkers, len(x0[0])))
             x0_aux[0:len(x0)] = x0
-            x0_aux[len(x0):] = misc.random_population(self.bounds, self.number_of_walkers - len(x0))
+            x0_aux[len(x0):] = self._initial_population(self.number_of_walkers - len(x0))
             x0 = x0_aux
         elif len(x0) > self.number_of_walkers:
             x0 = x0[0:self.number_of_walkers]
@@ -275,6 +652,29 @@ class HGDL:
             x0 = x0
         return x0
 
+    def _initial_population(self, n):
+        if self.initial_population == "random": return misc.random_population(self.bounds, n)
+        if self.sampler.method == self.initial_population: return self.sampler.sample(n)
+        return qmc_sampler(self.bounds, self.initial_population, seed=np.random.randint(2 ** 31)).sample(n)
+
+    def _set_budgets(self, max_time, max_evaluations, stagnation_epochs, stagnation_rank):
+        self.max_time = max_time
+        self.max_evaluations = max_evaluations
+        self.stagnation_epochs = stagnation_epochs
+        self.stagnation_rank = stagnation_rank
+
+    ###########################################################################
+    def _init_executor(self, dask_client, executor):
+        if executor is None:
+            executor = dask_executor(self._init_dask_client(dask_client))
+        elif executor in ("threads", "processes"):
+            executor = local_executor(processes=executor == "processes")
+            logger.debug("HGDL runs in the current process using {}", executor)
+        self.workers = executor.assign_workers()
+        logger.debug(f"Host {self.workers['host']} has {len(self.workers['walkers'])} workers.")
+        self.number_of_walkers = len(self.workers["walkers"])
+        return executor
+
     ###########################################################################
     def _init_dask_client(self, dask_client):
         if dask_client is None:
@@ -282,41 +682,53 @@ class HGDL:
             logger.debug("No dask client provided to HGDL. Using the local client")
         else:
             logger.debug("dask client provided to HGDL")
-        client = dask_client
-        worker_info = list(client.scheduler_info()["workers"].keys())
-        if not worker_info: raise Exception("No workers available")
-        self.workers = {"host": worker_info[0],
-                        "walkers": worker_info[1:]}
-        logger.debug(f"Host {self.workers['host']} has {len(self.workers['walkers'])} workers.")
-        self.number_of_walkers = len(self.workers["walkers"])
-        return client
+        return dask_client
 
     ###########################################################################
-    def _run_epochs(self, client):
-        self.break_condition = distributed.Variable("break_condition", client)
-        self.transfer_data = distributed.Variable("transfer_data", client)
-        a = distributed.protocol.serialize(self.optima)
-        self.transfer_data.set(a)
+    def _run_epochs(self, executor, state=None, on_new_optimum=None):
+        # the variables and queues of a run are named uniquely, so runs can share a client
+        name = "hgdl-" + uuid.uuid4().hex + "-"
+        self.break_condition = executor.variable(name + "break_condition")
+        self.stop_reason = executor.variable(name + "stop_reason")
+        self.stop_reason.set(None)
+        self.transfer_data = executor.queue(name + "transfer_data")
+        self.metrics_data = executor.queue(name + "metrics") if self.metrics else None
         self.break_condition.set(False)
         data = {"transfer data": self.transfer_data,
-                "break condition": self.break_condition,
-                "optima": self.optima, "metadata": self.meta_data}
-        bf = client.scatter(data, workers=self.workers["host"])
-        self.main_future = client.submit(hgdl, bf, workers=self.workers["host"])
-        self.client = client
+                "break condition": self.break_condition, "stop reason": self.stop_reason,
+                "optima": self.optima, "metadata": self.meta_data,
+                "executor": executor, "checkpoint": self.checkpoint, "state": state,
+                "metrics": self.metrics_data}
+        self.main_future = executor.run_host(hgdl, data, self.workers["host"])
+        self.executor = executor
+        self.client = getattr(executor, "client", None)
+        self._listener = None
+        if on_new_optimum is not None:
+            self._get_listener().subscribe(on_new_optimum)
+            self._listener.start()
+
+    ###########################################################################
+    def _get_listener(self):
+        if self._listener is None:
+            self._listener = optima_listener(self.transfer_data, self.optima, self.main_future.done)
+        return self._listener
+
+    ###########################################################################
+    def __getstate__(self):
+        # the HGDL object is sent to the workers (or a process pool) with callables
+        # bound to it, e.g. hess=hgdl.hess_approx. The executor, the dask variables,
+        # queues and futures, the listener thread and the meta data (which holds
+        # the callables again) belong to the client's running optimization and are left out.
+        state = self.__dict__.copy()
+        for key in ("executor", "client", "main_future", "break_condition", "stop_reason", "transfer_data", "metrics_data",
+                    "meta_data", "_listener"):
+            state.pop(key, None)
+        return state
 
     ###########################################################################
     def hess_approx(self, x, *args):
         ##implements a first-order approximation
-        len_x = len(x)
-        hess = np.zeros((len_x, len_x))
-        epsilon = 1e-6
-        grad_x = self.grad(x, *args)
-        for i in range(len_x):
-            x_temp = np.array(x)
-            x_temp[i] = x_temp[i] + epsilon
-            hess[i, i:] = ((self.grad(x_temp, *args) - grad_x) / epsilon)[i:]
-        return hess + hess.T - np.diag(np.diag(hess))
+        return finite_difference_hessian(self.grad, vectorized=self.vectorized)(x, *args)
 
 
 ###########################################################################
@@ -329,41 +741,194 @@ def hgdl(data):
     transfer_data = data["transfer data"]
     break_condition = data["break condition"]
     optima = data["optima"]
-    logger.debug("HGDL computing epoch 1 of {}", metadata.num_epochs)
-    res = run_local(metadata,optima,metadata.x0)
-    logger.debug("filling in optima list for the first time.", flush = True)
-    optima.fill_in_optima_list(res)
-    logger.debug("optima list filled", flush = True)
-    a = distributed.protocol.serialize(optima)
-    transfer_data.set(a)
-
-    logger.debug("HGDL first local optimization round done.", flush = True)
-    for i in range(1, metadata.num_epochs):
-        bc = break_condition.get()
-        if bc is True:
+    checkpoint = data.get("checkpoint")
+    state = data.get("state")
+    metrics = run_metrics(data["metrics"]) if metadata.metrics else None
+    shared = shared_data(data["executor"], metadata, metrics)
+    if state is not None:
+        np.random.set_state(state["rng"])
+        metadata.sampler = state.get("sampler", metadata.sampler)
+        metadata.archive = state.get("archive", metadata.archive)
+    if metadata.scheduling == "steady state":
+        optima = run_hgdl_steady_state(metadata, optima, transfer_data, break_condition, shared, checkpoint, state)
+        return finish(data, optima, shared)
+    start, x0 = (0, metadata.x0) if state is None else (state["epoch"], state["walkers"])
+    for i in range(start, metadata.num_epochs):
+        if i > start and break_condition.get() is True:
             logger.debug(f"HGDL Epoch {i} was cancelled")
+            shared.stopping.reason = "cancelled"
             break
         logger.debug(f"HGDL computing epoch {i + 1} of {{}}", metadata.num_epochs)
-        optima = run_hgdl_epoch(metadata, optima)
-        a = distributed.protocol.serialize(optima)
-        transfer_data.set(a)
-    logger.debug("HGDL finished all epochs!")
+        if metrics is not None: metrics.epoch = i
+        shared.set_epoch(i)
+        optima = run_hgdl_epoch(metadata, optima, shared, x0)
+        shared.stopping.end_epoch(optima)
+        last = i + 1 == metadata.num_epochs or shared.stopping.check(predict=True) is not None
+        x0, global_step_start = None, time.perf_counter()
+        if not last: x0 = global_step(metadata, optima, min(optima.size, shared.number_of_starts()))
+        if metrics is not None: metrics["epochs"].add_to_last(global_step_time=time.perf_counter() - global_step_start)
+        publish(transfer_data, optima, checkpoint, metrics)
+        if checkpoint is not None:
+            checkpoint.save({"epoch": i + 1, "walkers": x0, "sampler": metadata.sampler,
+                             "archive": metadata.archive}, force=last)
+        if last: break
+    return finish(data, optima, shared)
+
+
+###########################################################################
+def finish(data, optima, shared):
+    """
+    records why the host loop stopped and ends the optima stream
+    """
+    reason = shared.stopping.reason or "num_epochs"
+    logger.debug("HGDL stopped: {}", reason)
+    data["stop reason"].set(reason)
+    # end marker of the optima stream
+    data["transfer data"].put(None)
     return optima
 
 
 ###########################################################################
-def run_hgdl_epoch(metadata, optima):
-    optima_list = optima.list
-    n = min(len(optima_list),metadata.number_of_walkers)
-    ind_pos = [entry["x"] for entry in optima_list]
-    ind_fit = [entry["f(x)"] for entry in optima_list]
+def publish(transfer_data, optima, checkpoint=None, metrics=None):
+    """
+    sends the optima stored (and the metrics recorded) since the last call
+    to the client and records the optima for the next checkpoint
+    """
+    delta = optima.get_delta()
+    if delta is not None: transfer_data.put(delta)
+    if checkpoint is not None: checkpoint.record(delta)
+    if metrics is not None: metrics.publish()
+
 
+###########################################################################
+def run_hgdl_epoch(metadata, optima, shared, x0=None):
+    """
+    runs the local optimizations of one epoch, starting at x0
+    (default: positions proposed by the global step); starts in regions
+    explored by earlier walkers are re-sampled (see tabu_filter)
+    """
+    start_time = time.perf_counter()
+    if x0 is None: x0 = global_step(metadata, optima, min(optima.size, shared.number_of_starts()))
+    x0 = tabu_filter(metadata, x0, optima.deflation_index)
+    local_start = time.perf_counter()
+    res = run_local(metadata,optima,x0,shared)
+    fill_start = time.perf_counter()
+    optima.fill_in_optima_list(res)
+    if shared.metrics is not None:
+        end_time = time.perf_counter()
+        shared.metrics["epochs"].append(epoch=shared.metrics.epoch, time=end_time - start_time,
+                                        global_step_time=local_start - start_time,
+                                        local_time=fill_start - local_start, gather_time=shared.metrics.gather_time,
+                                        fill_time=end_time - fill_start, number_of_walkers=len(res[0]),
+                                        number_of_optima=len(optima), deflation_size=len(optima.deflation_index),
+                                        deflation_bytes=shared.metrics.deflation_bytes)
+        shared.metrics.deflation_bytes = 0
+    return optima
+
+
+###########################################################################
+def global_step(metadata, optima, number_of_offspring):
+    if metadata.global_optimizer in SEQUENCES:
+        return metadata.sampler.sample(number_of_offspring, optima.deflation_index)
+    if metadata.global_optimizer == "surrogate":
+        x0 = metadata.surrogate.propose(metadata.archive, number_of_offspring, optima.deflation_index)
+        return np.vstack([x0, new_positions(metadata, number_of_offspring - len(x0), optima.deflation_index)])
+    n = min(optima.size, metadata.number_of_walkers)
+    if n == 0: return new_positions(metadata, number_of_offspring, optima.deflation_index)
     global_res = run_global(\
-            np.array(ind_pos[:n]),
-            np.array(ind_fit[0:n]),
-            metadata.bounds[0:metadata.dim], metadata.global_optimizer,n)
-    x0 = np.zeros((n,metadata.dim))
+            np.array(optima.x[:n]),
+            np.array(optima.f[0:n]),
+            metadata.bounds[0:metadata.dim], metadata.global_optimizer, number_of_offspring)
+    x0 = np.zeros((number_of_offspring,metadata.dim))
     x0[:,0:metadata.dim] = np.array(global_res)
-    res = run_local(metadata,optima,x0)
-    op = optima.fill_in_optima_list(res)
+    return x0
+
+
+###########################################################################
+def run_hgdl_steady_state(metadata, optima, transfer_data, break_condition, shared, checkpoint=None, state=None):
+    """
+    runs the walkers without an epoch barrier; every finished local
+    optimization is filled into the optima list right away and the freed
+    worker starts a new walker proposed by the global optimizer
+    """
+    walkers = metadata.workers["walkers"]
+    number_of_solves = metadata.num_epochs * metadata.number_of_walkers
+    if state is None: x0, submitted, finished = metadata.x0, len(metadata.x0), 0
+    else: x0, submitted, finished = state["walkers"], state["submitted"], state["finished"]
+    # every walker worker gets a task; each finished task is replaced by one new task on its worker
+    missing = min(shared.number_of_starts() - len(x0), number_of_solves - submitted)
+    if missing > 0:
+        x0 = np.vstack([x0, tabu_filter(metadata, new_positions(metadata, missing, optima.deflation_index),
+                                        optima.deflation_index)])
+        submitted += missing
+    size = shared.task_size.size
+    # the schedules of the tolerance and the iteration limit advance with windows of number_of_walkers results
+    shared.set_epoch(finished // metadata.number_of_walkers)
+    # tasks map to (worker, x0, submission time, refining, coarse); coarse tasks ran with the schedules
+    tasks = {}
+    for i, start in enumerate(range(0, len(x0), size)):
+        worker = walkers[i % len(walkers)]
+        task = submit_local_method(shared, x0[start:start + size], optima.deflation_index, worker)
+        tasks[task] = (worker, x0[start:start + size], time.time(), False, shared.coarse and metadata.refine)
+    # walkers converging too close to each other are removed within
+    # windows of number_of_walkers results, like within one epoch
+    accepted = deflation_index(metadata.dim)
+    saved = False
+    completed = shared.executor.as_completed(tasks)
+    for task in completed:
+        worker, task_x0, submitted_time, refining, coarse = tasks.pop(task)
+        result = task.result()
+        if shared.metrics is not None: shared.metrics.add_task(submitted_time, time.time(), result, task_x0.nbytes)
+        shared.task_size.update(result[-1], len(result[0]))
+        shared.stopping.add_task(result)
+        record_samples(metadata, result)
+        polish = None
+        if coarse:
+            # the accepted results are polished below, the others are dropped
+            res = collect_local_results([result], metadata.dim, optima.deflation_index)
+            if np.any(res[5]): polish = res[0][res[5]]
+        else:
+            res = collect_local_results([result], metadata.dim, optima.deflation_index, accepted)
+            optima.fill_in_optima_list(res)
+            if metadata.abort_interval: shared.abort_value = abort_value(metadata, optima)
+            publish(transfer_data, optima, checkpoint, shared.metrics)
+        window_finished = False
+        if not refining:
+            window_finished = (finished + len(result[0])) // metadata.number_of_walkers > finished // metadata.number_of_walkers
+            if window_finished:
+                accepted = deflation_index(metadata.dim)
+                shared.stopping.end_epoch(optima)
+            finished += len(result[0])
+            shared.set_epoch(finished // metadata.number_of_walkers)
+        if break_condition.get() is True:
+            logger.debug(f"HGDL was cancelled after {finished} local optimizations")
+            shared.stopping.reason = "cancelled"
+            break
+        if shared.stopping.check() is not None: break
+        if polish is not None:
+            # the accepted walkers of a coarse task are polished on the same worker before they are filled in
+            task = submit_local_method(shared, polish, optima.deflation_index, worker, refine=True)
+            tasks[task] = (worker, polish, time.time(), True, False)
+            completed.add(task)
+        elif submitted < number_of_solves:
+            size = min(shared.task_size.size, number_of_solves - submitted)
+            x0 = tabu_filter(metadata, global_step(metadata, optima, size), optima.deflation_index)
+            task = submit_local_method(shared, x0, optima.deflation_index, worker)
+            tasks[task] = (worker, x0, time.time(), False, shared.coarse and metadata.refine)
+            completed.add(task)
+            submitted += size
+        saved = False
+        if checkpoint is not None and window_finished:
+            # the walkers still running are restarted on resume
+            saved = checkpoint.save(_steady_state(tasks, metadata, submitted, finished))
+    shared.executor.cancel(list(tasks))
+    if checkpoint is not None and not saved:
+        checkpoint.save(_steady_state(tasks, metadata, submitted, finished), force=True)
+    logger.debug("HGDL finished all local optimizations!")
     return optima
+
+
+def _steady_state(tasks, metadata, submitted, finished):
+    walkers = np.vstack([np.empty((0, metadata.dim))] + [task[1] for task in tasks.values()])
+    return {"walkers": walkers, "submitted": submitted, "finished": finished, "sampler": metadata.sampler,
+            "archive": metadata.archive}
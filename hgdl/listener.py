@@ -0,0 +1,83 @@
+import threading
+
+from loguru import logger
+
+
+class optima_listener:
+    """
+    receives the optima deltas published by the host in a background thread
+    of the client, merges them into the client's optima store and hands every
+    new optimum (a dictionary like the entries of optima.list) to the subscribers.
+    The thread blocks on the queue; it stops at the end marker (None) of the
+    host or, if the host failed or was cancelled, once done() returns True.
+
+    input:
+    -----
+        transfer_data ... the queue the host publishes the deltas to
+        optima ... the optima store of the client
+        done ... callable returning True when the host task has finished
+        timeout ... seconds between checks of done() while nothing arrives
+    """
+
+    def __init__(self, transfer_data, optima, done, timeout=1.0):
+        self.transfer_data = transfer_data
+        self.optima = optima
+        self.done = done
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, name="hgdl-listener", daemon=True)
+
+    def start(self):
+        """
+        starts the thread (once); subscribers registered before receive all optima
+        """
+        if self.thread.ident is None: self.thread.start()
+
+    def subscribe(self, on_new_optimum, on_end=None):
+        """
+        calls on_new_optimum(entry) for every optimum arriving from now on
+        and on_end() when the run has finished
+        """
+        with self.lock:
+            if not self.finished:
+                self.subscribers.append((on_new_optimum, on_end))
+                return
+        if on_end is not None: on_end()
+
+    def _run(self):
+        while True:
+            try:
+                items = [self.transfer_data.get(timeout=self.timeout)]
+            except Exception:
+                if not self.done(): continue
+                try:
+                    items = self.transfer_data.get(batch=True) + [None]
+                except Exception:
+                    items = [None]
+            for item in items:
+                if item is None: return self._finish()
+                self._deliver(item)
+
+    def _deliver(self, delta):
+        with self.lock:
+            self.optima.apply_delta(delta)
+            subscribers = list(self.subscribers)
+        for entry in self.optima.delta_entries(delta):
+            for on_new_optimum, on_end in subscribers:
+                try:
+                    on_new_optimum(entry)
+                except Exception as err:
+                    logger.exception(err)
+
+    def _finish(self):
+        with self.lock:
+            self.finished = True
+            subscribers, self.subscribers = self.subscribers, []
+        for on_new_optimum, on_end in subscribers:
+            try:
+                if on_end is not None: on_end()
+            except Exception as err:
+                logger.exception(err)
+        logger.debug("HGDL listener finished")
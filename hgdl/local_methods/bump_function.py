@@ -1,16 +1,62 @@
 ###local optimizer for hgdl
 import numpy as np
 
+from ..finite_differences import finite_difference_hessian, finite_difference_hessp
 
-def deflated_grad(x, *args, grad_func=None, x_defl=[], radius=[]):
-    d = deflation_function(x, x_defl, radius)
+
+def deflated_grad(x, *args, grad_func=None, x_defl=[], radius=[], index=None):
+    if index is not None: x_defl, radius = index.query(x)
+    d, dg = deflation_kernel(x, x_defl, radius)
     return d * grad_func(x, *args)
 
 
-def deflated_hess(x, *args, grad_func=None, hess_func=None, x_defl=[], radius=[]):
-    d = deflation_function(x, x_defl, radius)
-    dg = deflation_function_gradient(x, x_defl, radius)
-    return (hess_func(x, *args) * d) + np.outer(grad_func(x, *args), dg)
+def deflated_hess(x, *args, grad_func=None, hess_func=None, x_defl=[], radius=[], index=None):
+    if index is not None: x_defl, radius = index.query(x)
+    d, dg = deflation_kernel(x, x_defl, radius)
+    g = grad_func(x, *args)
+    return (_hessian(hess_func, x, g, *args) * d) + np.outer(g, dg)
+
+
+def batched_deflated_grad(x, *args, grad_func=None, x_defl=[], radius=[], index=None):
+    if index is not None: x_defl, radius = index.query_many(x)
+    d, dg = batched_deflation_kernel(x, x_defl, radius)
+    return d[:, None] * grad_func(x, *args)
+
+
+def batched_deflated_hess(x, *args, grad_func=None, hess_func=None, x_defl=[], radius=[], index=None):
+    if index is not None: x_defl, radius = index.query_many(x)
+    d, dg = batched_deflation_kernel(x, x_defl, radius)
+    g = grad_func(x, *args)
+    return (_hessian(hess_func, x, g, *args) * d[:, None, None]) + np.einsum("ni,nj->nij", g, dg)
+
+
+def deflated_hessp_operator(x, *args, grad_func=None, hessp_func=None, x_defl=[], radius=[], index=None):
+    """
+    returns a callable that multiplies (the symmetric part of) the deflated
+    Hessian at x with a vector, using only Hessian-vector products
+    """
+    if index is not None: x_defl, radius = index.query(x)
+    d, dg = deflation_kernel(x, x_defl, radius)
+    g = grad_func(x, *args)
+
+    def matvec(p):
+        p = np.ravel(p)
+        if isinstance(hessp_func, finite_difference_hessp): hp = hessp_func(x, p, *args, grad_x=g)
+        else: hp = hessp_func(x, p, *args)
+        return d * hp + 0.5 * (g * (dg @ p) + dg * (g @ p))
+
+    return matvec
+
+
+def deflated_hessp(x, p, *args, grad_func=None, hessp_func=None, x_defl=[], radius=[], index=None):
+    return deflated_hessp_operator(x, *args, grad_func=grad_func, hessp_func=hessp_func,
+                                   x_defl=x_defl, radius=radius, index=index)(p)
+
+
+def _hessian(hess_func, x, g, *args):
+    # finite difference Hessians (also timed ones, see hgdl.metrics) reuse the gradient at x
+    if isinstance(getattr(hess_func, "function", hess_func), finite_difference_hessian): return hess_func(x, *args, grad_x=g)
+    return hess_func(x, *args)
 
 
 ########################################################
@@ -39,13 +85,70 @@ def b_grad(x, x0, r):
        x0... location of bump
        r ... radius of bump function
     """
-    d = np.sqrt((x - x0).T @ (x - x0))
     d2 = (x - x0)
-    a = 1.0 - (d ** 2 / r ** 2)
+    a = 1.0 - ((d2 @ d2) / r ** 2)
     if a <= 0:
         return np.zeros((len(x)))
     else:
-        return (b(x, x0, r) * ((-2.0 * d2) / (a ** 2))) / r ** 2
+        return (np.exp(1.0 - 1.0 / a) * ((-2.0 * d2) / (a ** 2))) / r ** 2
+
+
+###########################################################################
+def deflation_kernel(x, x_defl, radius):
+    """
+    evaluates the deflation operator and its gradient for all bumps in one pass
+    input:
+        x ... one point (1d numpy array of shape (D))
+        x_defl ... locations of the bump functions (2d numpy array of shape (M x D))
+        radius ... radii of the bump functions (1d numpy array of shape (M))
+    return:
+        the deflation operator 1.0/(1.0 - sum(bumps)) and its gradient
+        (np.ndarray of shape (D)). The deflated Hessian term is
+        np.outer(grad(x), gradient).
+    """
+    x = np.asarray(x, dtype=float)
+    if len(x_defl) == 0: return 1.0, np.zeros((len(x)))
+    x_defl = np.asarray(x_defl, dtype=float).reshape(-1, len(x))
+    r2 = np.asarray(radius, dtype=float) ** 2
+    diff = x - x_defl
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = 1.0 - np.einsum("ij,ij->i", diff, diff) / r2
+    support = a > 0.0
+    if not np.any(support): return 1.0, np.zeros((len(x)))
+    a = a[support]
+    bumps = np.exp(1.0 - 1.0 / a)
+    s = np.sum(bumps)
+    s_grad = (bumps * (-2.0 / (a ** 2 * r2[support]))) @ diff[support]
+    if s == 1.0: s = 0.99999
+    return 1.0 / (1.0 - s), s_grad / ((1.0 - s) ** 2)
+
+
+###########################################################################
+def batched_deflation_kernel(x, x_defl, radius):
+    """
+    evaluates the deflation operator and its gradient at several points
+    input:
+        x ... points (2d numpy array of shape (N x D))
+        x_defl ... locations of the bump functions (2d numpy array of shape (M x D))
+        radius ... radii of the bump functions (1d numpy array of shape (M))
+    return:
+        the deflation operators (N) and their gradients (N x D)
+    """
+    x = np.asarray(x, dtype=float)
+    n, dim = x.shape
+    if len(x_defl) == 0: return np.ones((n)), np.zeros((n, dim))
+    x_defl = np.asarray(x_defl, dtype=float).reshape(-1, dim)
+    r2 = np.asarray(radius, dtype=float) ** 2
+    diff = x[:, None, :] - x_defl[None, :, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = 1.0 - np.einsum("nmd,nmd->nm", diff, diff) / r2
+    support = a > 0.0
+    a = np.where(support, a, 1.0)
+    bumps = np.where(support, np.exp(1.0 - 1.0 / a), 0.0)
+    s = np.sum(bumps, axis=1)
+    s_grad = np.einsum("nm,nmd->nd", bumps * (-2.0 / (a ** 2 * r2)), diff)
+    s[s == 1.0] = 0.99999
+    return 1.0 / (1.0 - s), s_grad / ((1.0 - s) ** 2)[:, None]
 
 
 ###########################################################################
@@ -56,12 +159,7 @@ def deflation_function(x, x0, r):
         x0 is a a 2d array of locations of the bump function
     the return is the deflation operator, e.g. 1.0/(1.0 - bump(x,x0))
     """
-    if len(x0) == 0: return 1.0
-    s = 0.0
-    for i in range(len(x0)):
-        s += b(x, x0[i], r[i])
-    if s == 1.0: s = 0.99999
-    return 1.0 / (1.0 - s)
+    return deflation_kernel(x, x0, r)[0]
 
 
 ###########################################################################
@@ -72,11 +170,4 @@ def deflation_function_gradient(x, x0, r):
         x0 is a 2d array of locations of the bump function
     the return is the gradient of the deflation operator, e.g. (1.0/(1.0 - bump(x,x0)))'
     """
-    if len(x0) == 0: return np.zeros((len(x)))
-    s1 = 0.0
-    s2 = np.zeros((len(x)))
-    for i in range(len(x0)):
-        s1 += b(x, x0[i], r[i])
-        s2 += b_grad(x, x0[i], r[i])
-    if s1 == 1.0: s1 = 0.99999
-    return s2 / ((1.0 - s1) ** 2)
+    return deflation_kernel(x, x0, r)[1]
@@ -1,32 +1,152 @@
 import numpy as np
 from loguru import logger
-from .. import misc
-
-
-def DNewton(func, grad, hess, bounds, x0, max_iter, tol, *args):
-    e = np.inf
-    gradient = np.ones((len(x0))) * np.inf
-    counter = 0
-    x = np.array(x0)
-    grad_list = []
-    while e > tol or np.max(abs(gradient)) > tol:
-        x = misc.project_onto_bounds(x, bounds)
-        x[abs(x) < 1e-16] = 0.
-        gradient = grad(x, *args)
-        gradient[abs(gradient) < 1e-16] = 0.
-        hessian = hess(x, *args)
-        # hessian = 0.5 * hessian @ hessian.T
-        hessian[abs(hessian) < 1e-16] = 0.
-        grad_list.append(np.max(gradient))
+
+
+def DNewton(func, grad, hess, bounds, x0, max_iter, tol, *args, eigenvalues=None, callback=None,
+            line_search=False, info=None):
+    """
+    deflated Newton method, a root finder of the (deflated) gradient.
+    With line_search the Newton steps are damped by a backtracking line search
+    on the merit function |grad|^2 / 2, otherwise full steps are taken;
+    all steps, including the last one, are projected onto the bounds.
+    eigenvalues is an optional callable returning the Hessian eigenvalues
+    at the result (default: the eigenvalues of the last Hessian, which is not
+    evaluated again at the result), callback is called with x after every
+    iteration (like in scipy.optimize.minimize) and the optional dictionary
+    info receives the number of iterations
+    """
+    x = _project(np.array(x0, dtype=float), bounds)
+    gradient = _chop(grad(x, *args))
+    success = False
+    iterations = 0
+    while True:
+        hessian = _chop(hess(x, *args))
+        gamma = newton_step(hessian, gradient)
+        if not np.all(np.isfinite(gamma)): break
+        iterations += 1
+        success = np.max(abs(gamma)) <= tol and np.max(abs(gradient)) <= tol
+        if success or iterations > max_iter:
+            # the exit step stays within the bounds and is damped like the others
+            if success or not line_search: x = _project(x + gamma, bounds)
+            else: x, gradient = damped_step(grad, x, gamma, gradient, bounds, args, line_search)
+            if callback is not None: callback(x)
+            break
+        x, gradient = damped_step(grad, x, gamma, gradient, bounds, args, line_search)
+        if callback is not None: callback(x)
+    logger.debug("dNewton finished after {} iterations, success: {}", iterations, success)
+    if info is not None: info["iterations"] = iterations
+    eig = np.linalg.eigvals(hessian) if eigenvalues is None else eigenvalues(x)
+    return x, func(x, *args), gradient, eig, success
+
+
+def newton_step(hessian, gradient):
+    """
+    solves hessian @ gamma = -gradient (in the least squares sense if the Hessian is singular)
+    """
+    try:
+        return np.linalg.solve(hessian, -gradient)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(hessian, -gradient, rcond=None)[0]
+
+
+def damped_step(grad, x, gamma, gradient, bounds, args, line_search, max_halvings=8, c=1e-4):
+    """
+    returns the next iterate x + alpha * gamma (projected onto the bounds) and
+    its gradient; with line_search alpha is halved from 1 until the merit
+    function |grad|^2 / 2 decreases sufficiently (Armijo condition). If no
+    step length does, e.g. because the (finite difference) Hessian is not
+    accurate enough, the full step is taken.
+    """
+    merit, alpha = gradient @ gradient, 1.0
+    full = None
+    for i in range(max_halvings if line_search else 1):
+        x_new = _project(x + alpha * gamma, bounds)
+        gradient_new = _chop(grad(x_new, *args))
+        if not line_search or gradient_new @ gradient_new <= (1.0 - 2.0 * c * alpha) * merit: return x_new, gradient_new
+        if full is None: full = x_new, gradient_new
+        alpha *= 0.5
+    return full
+
+
+def _project(x, bounds):
+    x = np.clip(x, bounds[..., 0], bounds[..., 1])
+    x[abs(x) < 1e-16] = 0.
+    return x
+
+
+def _chop(a):
+    a[abs(a) < 1e-16] = 0.
+    return a
+
+
+###########################################################################
+def batched_DNewton(func, grad, hess, bounds, x0, max_iter, tol, *args, eigenvalues=None, line_search=False,
+                    callback=None, info=None):
+    """
+    advances N walkers (x0 of shape N x D) together; func, grad and hess
+    accept (N x D) arrays and return (N), (N x D) and (N x D x D) arrays.
+    Converged walkers are masked out of the following steps.
+    eigenvalues is an optional callable returning the Hessian eigenvalues
+    at the results (N x D) (default: the eigenvalues of the last Hessian
+    of every walker); line_search as in DNewton; callback is called with
+    the positions (M x D) of the walkers still moving after every iteration.
+    Every walker stops after the same number of iterations as in DNewton;
+    the optional dictionary info receives them (array of N)
+    """
+    x = _project(np.array(x0, dtype=float), bounds)
+    gradient = _chop(grad(x, *args))
+    eig = np.zeros(x.shape, dtype=complex)
+    active = np.ones((len(x)), dtype=bool)
+    local_success = np.zeros((len(x)), dtype=bool)
+    iterations = np.zeros((len(x)), dtype=int)
+    while np.any(active):
+        indices = np.where(active)[0]
+        x_a, g_a = x[indices], gradient[indices]
+        hessian = _chop(hess(x_a, *args))
         try:
-            gamma = np.linalg.solve(hessian, -gradient)
-        except Exception as error:
-            gamma, a, b, c = np.linalg.lstsq(hessian, -gradient, rcond=None)
-        if any(gamma == np.nan) or any(gamma == np.inf): return x, func(x, *args), gradient, \
-        np.linalg.eig(hess(x, *args))[0], False
-        x += gamma
-        e = np.max(abs(gamma))
-        logger.debug("dNewton step size: ", e, " max gradient: ", np.max(abs(gradient)))
-        if counter > max_iter: return x, func(x, *args), gradient, np.linalg.eig(hess(x, *args))[0], False
-        counter += 1
-    return x, func(x, *args), gradient, np.linalg.eig(hess(x, *args))[0], True
+            gamma = np.linalg.solve(hessian, -g_a[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            gamma = np.einsum("nij,nj->ni", np.linalg.pinv(hessian), -g_a)
+        failed = ~np.all(np.isfinite(gamma), axis=1)
+        iterations[indices[~failed]] += 1
+        converged = ~failed & (np.max(abs(gamma), axis=1) <= tol) & (np.max(abs(g_a), axis=1) <= tol)
+        done = failed | converged | (iterations[indices] > max_iter)
+        finished = done & ~failed
+        x[indices[finished]] = _project(x_a[finished] + gamma[finished], bounds)
+        # walkers stopped by max_iter take a damped exit step
+        stopped = finished & ~converged
+        if line_search and np.any(stopped):
+            x[indices[stopped]], gradient[indices[stopped]] = batched_damped_step(
+                grad, x_a[stopped], gamma[stopped], g_a[stopped], bounds, args, line_search)
+        if eigenvalues is None and np.any(done): eig[indices[done]] = np.linalg.eigvals(hessian[done])
+        local_success[indices[converged]] = True
+        active[indices[done]] = False
+        moving = ~done
+        if np.any(moving):
+            x[indices[moving]], gradient[indices[moving]] = batched_damped_step(
+                grad, x_a[moving], gamma[moving], g_a[moving], bounds, args, line_search)
+            if callback is not None: callback(x[indices[moving]])
+    if info is not None: info["iterations"] = iterations
+    if eigenvalues is not None: eig = eigenvalues(x)
+    return x, func(x, *args), gradient, eig, local_success
+
+
+def batched_damped_step(grad, x, gamma, gradient, bounds, args, line_search, max_halvings=8, c=1e-4):
+    """
+    damped_step for N walkers; every walker has its own step length
+    """
+    merit, alpha = np.sum(gradient ** 2, axis=1), np.ones((len(x)))
+    x_new = _project(x + gamma, bounds)
+    gradient_new = _chop(grad(x_new, *args))
+    if not line_search: return x_new, gradient_new
+    full = x_new.copy(), gradient_new.copy()
+    rejected = np.ones((len(x)), dtype=bool)
+    for i in range(max_halvings):
+        rejected[rejected] = ~(np.sum(gradient_new[rejected] ** 2, axis=1) <= (1.0 - 2.0 * c * alpha[rejected]) * merit[rejected])
+        if not np.any(rejected) or i == max_halvings - 1: break
+        alpha[rejected] *= 0.5
+        x_new[rejected] = _project(x[rejected] + alpha[rejected, None] * gamma[rejected], bounds)
+        gradient_new[rejected] = _chop(grad(x_new[rejected], *args))
+    # walkers without sufficient decrease take the full step
+    x_new[rejected], gradient_new[rejected] = full[0][rejected], full[1][rejected]
+    return x_new, gradient_new
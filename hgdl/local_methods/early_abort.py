@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class walker_aborted(Exception):
+    """
+    raised by the callback of a local optimizer to stop an aborted walker at x
+    """
+
+    def __init__(self, x):
+        super().__init__("walker aborted")
+        self.x = x
+
+
+class abort_monitor:
+    """
+    checks every interval-th iteration of a local optimization whether the
+    walker entered the basin of a deflated optimum, or stalls (relative
+    decrease of the function value since the previous check below stall)
+    at a value worse than value, the reference of the host (see abort_value)
+
+    input:
+    -----
+        d ... the meta data (func, args, abort_interval and abort_stall)
+        defl_index ... deflation_index of the deflated positions
+        value ... the reference value; np.inf disables the value check
+    """
+
+    def __init__(self, d, defl_index, value=np.inf):
+        self.func = d.func
+        self.args = d.args
+        self.defl_index = defl_index
+        self.interval = d.abort_interval
+        self.stall = d.abort_stall
+        self.value = value
+        self.iterations = 0
+        self.previous = None
+        self.reason = None
+
+    def __call__(self, x, *unused):
+        """
+        returns True if the walker at x should be aborted
+        """
+        self.iterations += 1
+        if self.iterations % self.interval: return False
+        if self.defl_index.in_basin(x): self.reason = "basin"
+        elif np.isfinite(self.value):
+            f = self.func(x, *self.args)
+            if f > self.value and self.previous is not None and self.previous - f <= self.stall * abs(f):
+                self.reason = "dominated"
+            self.previous = f
+        return self.reason is not None
+
+    def callback(self, x, *unused):
+        """
+        callback for scipy.optimize.minimize
+        """
+        if self(x): raise walker_aborted(np.array(x))
+
+
+def abort_value(d, optima):
+    """
+    the reference value of the walkers: the abort_rank-th best stored
+    optimum plus abort_margin (np.inf while there are fewer optima)
+    """
+    if optima.size < d.abort_rank: return np.inf
+    return optima.f[d.abort_rank - 1] + d.abort_margin
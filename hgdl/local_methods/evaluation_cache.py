@@ -0,0 +1,93 @@
+import collections
+
+import numpy as np
+
+from ..finite_differences import finite_difference_hessian
+
+
+class evaluation_cache:
+    """
+    memoizes func, grad and hess of one walker at the most recently evaluated
+    points; entries are keyed by the bytes of x and the least recently used
+    point is evicted first.
+    With fun_and_grad (scipy's jac=True convention: returns value and gradient)
+    the value and the gradient at a point come from one call.
+
+    input:
+    -----
+        func, grad, hess ... the user's callables
+        fun_and_grad ... optional fused callable returning (value, gradient)
+        size ... the number of points kept
+    """
+
+    def __init__(self, func, grad, hess, fun_and_grad=None, size=16):
+        self._func = func
+        self._grad = grad
+        self._hess = hess
+        self._fun_and_grad = fun_and_grad
+        # finite difference Hessians reuse the (cached) gradient at x
+        self._reuse_gradient = isinstance(getattr(hess, "function", hess), finite_difference_hessian)
+        self.size = size
+        self._entries = collections.OrderedDict()
+
+    def _entry(self, x):
+        x = np.asarray(x)
+        key = (x.dtype.str, x.shape, x.tobytes())
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {}
+            if len(self._entries) > self.size: self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _value_and_gradient(self, entry, x, *args):
+        entry["f"], entry["g"] = self._fun_and_grad(x, *args)
+
+    def func(self, x, *args):
+        entry = self._entry(x)
+        if "f" not in entry:
+            if self._fun_and_grad is not None: self._value_and_gradient(entry, x, *args)
+            else: entry["f"] = self._func(x, *args)
+        return entry["f"]
+
+    def grad(self, x, *args):
+        entry = self._entry(x)
+        if "g" not in entry:
+            if self._fun_and_grad is not None: self._value_and_gradient(entry, x, *args)
+            else: entry["g"] = self._grad(x, *args)
+        return entry["g"]
+
+    def hess(self, x, *args):
+        entry = self._entry(x)
+        if "h" not in entry:
+            if self._reuse_gradient:
+                entry["h"] = self._hess(x, *args, grad_x=self.grad(x, *args))
+            else:
+                entry["h"] = self._hess(x, *args)
+        return entry["h"]
+
+
+###########################################################################
+class value_part:
+    """
+    the value of a fused callable returning (value, gradient)
+    """
+
+    def __init__(self, fun_and_grad):
+        self.fun_and_grad = fun_and_grad
+
+    def __call__(self, x, *args):
+        return self.fun_and_grad(x, *args)[0]
+
+
+class gradient_part:
+    """
+    the gradient of a fused callable returning (value, gradient)
+    """
+
+    def __init__(self, fun_and_grad):
+        self.fun_and_grad = fun_and_grad
+
+    def __call__(self, x, *args):
+        return np.asarray(self.fun_and_grad(x, *args)[1])
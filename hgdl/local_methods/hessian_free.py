@@ -0,0 +1,26 @@
+import numpy as np
+from scipy.sparse.linalg import ArpackNoConvergence, LinearOperator, eigsh
+
+
+def extreme_eigenvalues(matvec, dim, tol=1e-8):
+    """
+    estimates the smallest and the largest eigenvalue of a symmetric operator
+    with Lanczos iterations (scipy.sparse.linalg.eigsh), using only products
+    input:
+        matvec ... callable returning the product of the operator with a vector (D)
+        dim ... the dimensionality D
+    return:
+        np.ndarray of the smallest and the largest eigenvalue;
+        for D <= 2 all eigenvalues, computed from D products
+    """
+    if dim <= 2:
+        a = np.column_stack([matvec(e) for e in np.eye(dim)])
+        return np.linalg.eigvalsh(0.5 * (a + a.T))
+    operator = LinearOperator((dim, dim), matvec=matvec, dtype=float)
+    eigenvalues = []
+    for which in ("SA", "LA"):
+        try:
+            eigenvalues.append(eigsh(operator, k=1, which=which, tol=tol, return_eigenvectors=False)[0])
+        except ArpackNoConvergence as err:
+            eigenvalues.append(err.eigenvalues[0] if len(err.eigenvalues) else np.nan)
+    return np.array(eigenvalues)
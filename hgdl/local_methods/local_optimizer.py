@@ -1,128 +1,493 @@
+import copy
+import time
+import uuid
+from functools import partial
+
 import numpy as np
-from distributed import get_client
 from loguru import logger
 from scipy.optimize import minimize
 
 from . import bump_function as defl
-from .. import misc
+from ..global_methods.global_optimizer import new_positions, tabu_filter
+from ..archive import trajectory_recorder
+from ..metrics import instrument, call_columns
+from ..stopping import counted, stopping_criteria
+from ..deflation_index import deflation_index, replica
+from ..executors import dask_executor
+from ..finite_differences import finite_difference_hessp
 from .dNewton import DNewton as DNewton
+from .dNewton import batched_DNewton
+from .early_abort import abort_monitor, abort_value, walker_aborted
+from .evaluation_cache import evaluation_cache
+from .hessian_free import extreme_eigenvalues
 import warnings
 
 
-def run_local(d, optima, x0):
-    x_defl, f_defl, radii = optima.get_deflation_points(len(optima.list))
-    return run_local_optimizer(d, x0, x_defl, radii)
+def run_local(d, optima, x0, shared=None):
+    if shared is not None and d.abort_interval: shared.abort_value = abort_value(d, optima)
+    res = run_local_optimizer(d, x0, optima.deflation_index, shared)
+    if shared is None or not shared.coarse or not d.refine: return res
+    # only the accepted results of a coarse epoch are polished to the final tolerance, the others are dropped
+    if not np.any(res[5]): return tuple(a[0:0] for a in res)
+    return run_local_optimizer(d, res[0][res[5]], optima.deflation_index, shared, refine=True)
+
+
+def scheduled(schedule, epoch, final):
+    """
+    the value of a tolerance or iteration schedule (a callable of the epoch
+    or a sequence of values of the first epochs) in epoch;
+    final if the schedule is None, has ended or returns None
+    """
+    if schedule is None: return final
+    if callable(schedule): value = schedule(epoch)
+    else: value = schedule[epoch] if epoch < len(schedule) else None
+    return final if value is None else value
+
+
+###########################################################################
+class shared_data:
+    """
+    keeps the meta data (including the user's args) and the current
+    deflation set in the memory of the walker workers.
+    The meta data is scattered once. The deflation set is sent as a base
+    snapshot plus the points appended since (deltas); every worker fetches
+    each of them once and keeps its own copy up to date (see deflation_index.replica),
+    so walker tasks only carry references to them and their starting positions.
+    A new base is sent after max_deltas deltas or when the set was rebuilt.
+    The workers keep as many copies as the executor has replicas (one per problem).
+    It also decides how many local optimizations each walker task runs,
+    keeps the tolerance and iteration limit of the current epoch
+    (see set_epoch), the stopping criteria and the metrics of the run
+    (None if they are not collected).
+    """
+
+    def __init__(self, executor, d, metrics=None, max_deltas=32):
+        self.executor = executor
+        self.metrics = metrics
+        self.workers = d.workers["walkers"]
+        self.metadata = executor.broadcast(d, self.workers)
+        self.max_deltas = max_deltas
+        self.max_replicas = executor.replicas
+        self.deflation_key = uuid.uuid4().hex
+        self.deflation_source = None
+        self.deflation_bases = 0
+        self.deflation_base = None
+        self.deflation_deltas = []
+        self.deflation_sent = 0
+        self.number_of_walkers = d.number_of_walkers
+        self.task_size = task_size(d.chunk_size, d.target_task_time)
+        self.abort_value = np.inf
+        self.final = (d.tolerance, d.local_max_iter)
+        self.schedules = (d.tolerance_schedule, d.max_iter_schedule)
+        self.tolerance, self.max_iter = self.final
+        self.stopping = stopping_criteria(d)
+
+    def set_epoch(self, epoch):
+        """
+        sets the tolerance and the iteration limit of the walkers of the epoch
+        """
+        self.tolerance = scheduled(self.schedules[0], epoch, self.final[0])
+        self.max_iter = scheduled(self.schedules[1], epoch, self.final[1])
+
+    @property
+    def coarse(self):
+        """
+        True if the walkers of the current epoch do not converge to the final tolerance
+        """
+        return self.tolerance > self.final[0] or self.max_iter < self.final[1]
+
+    def get_deflation(self, defl_index):
+        """
+        returns the reference to defl_index passed to local_method_batch
+        """
+        source, sent = (id(defl_index), defl_index.generation), len(defl_index)
+        if source != self.deflation_source or len(self.deflation_deltas) >= self.max_deltas:
+            self.deflation_base = self.executor.put(defl_index.snapshot(), self.workers)
+            self.deflation_source, self.deflation_bases, self.deflation_deltas = source, self.deflation_bases + 1, []
+            new = defl_index.x, defl_index.r
+        elif sent > self.deflation_sent:
+            new = defl_index.x[self.deflation_sent:].copy(), defl_index.r[self.deflation_sent:].copy()
+            self.deflation_deltas.append(self.executor.put(new, self.workers))
+        else: new = ()
+        self.deflation_sent = sent
+        if self.metrics is not None: self.metrics.deflation_bytes += sum(a.nbytes for a in new)
+        return (self.deflation_key, self.deflation_bases, self.deflation_base, list(self.deflation_deltas),
+                self.max_replicas)
+
+    def number_of_starts(self):
+        """
+        the number of local optimizations per epoch; enough to give
+        every worker one task of the current size
+        """
+        return max(self.number_of_walkers, len(self.workers) * self.task_size.size)
+
+
+###########################################################################
+class task_size:
+    """
+    number of local optimizations per walker task.
+    For chunk_size="auto" it is adapted to the measured runtime of the
+    local optimizations, so that a task takes about target_task_time seconds.
+    """
+
+    def __init__(self, chunk_size, target_task_time, max_size=1024):
+        self.auto = chunk_size == "auto"
+        self.size = 1 if self.auto else int(chunk_size)
+        self.target_task_time = target_task_time
+        self.max_size = max_size
+        self.time_per_walker = None
+
+    def update(self, runtime, number_of_walkers):
+        t = runtime / max(number_of_walkers, 1)
+        if self.time_per_walker is None: self.time_per_walker = t
+        else: self.time_per_walker = 0.7 * self.time_per_walker + 0.3 * t
+        if self.auto:
+            self.size = int(np.clip(round(self.target_task_time / max(self.time_per_walker, 1e-9)), 1, self.max_size))
 
 
 ###########################################################################
-def run_local_optimizer(d, x0, x_defl=[], radii=[]):
+def run_local_optimizer(d, x0, defl_index=None, shared=None, refine=False):
     """
     this function runs a deflated local methos for
     all the walkers.
     The loop below goes over every walker
     input:
         2d numpy array of initial positions
-        2d numpy array of positions of deflations (optional, default = [])
+        deflation_index of the deflated positions (optional, default = None)
+        shared_data of the meta data on the walkers (optional, default = None)
+        refine: polish the positions x0 with the final tolerance
+                (optional, default = False: run the walkers of the epoch)
     return:
         optima_locations, func values, gradient norms, eigenvalues, local_success(bool)
     """
     dim = d.dim
-    number_of_walkers = d.number_of_walkers
+    if shared is None: shared = shared_data(dask_executor(), d)
+    number_of_walkers = shared.number_of_starts()
+    if defl_index is None: defl_index = deflation_index(dim)
 
+    if refine: number_of_walkers = len(x0)
     if len(x0) < number_of_walkers:
-        x0 = np.row_stack([x0, misc.random_population(d.bounds, number_of_walkers - len(x0))])
+        x0 = np.vstack([x0, tabu_filter(d, new_positions(d, number_of_walkers - len(x0), defl_index), defl_index)])
+
+    x0 = x0[0:number_of_walkers]
+    walkers = d.workers["walkers"]
+    # vectorized objectives advance all walkers of a worker in one task
+    if d.vectorized: chunks = [c for c in np.array_split(x0, min(len(walkers), len(x0))) if len(c)]
+    else: chunks = [x0[i:i + shared.task_size.size] for i in range(0, len(x0), shared.task_size.size)]
 
-    client = get_client()
-    tasks = []
-    for i in range(min(len(x0), number_of_walkers)):
+    tasks, submitted = [], []
+    for i in range(len(chunks)):
         logger.debug(f"Worker {i} submitted")
-        worker = d.workers["walkers"][(int(i - ((i // number_of_walkers) * number_of_walkers)))]
-        data = {"d": d, "x0": x0[i], "x_defl": x_defl, "radius": radii}
-        tasks.append(client.submit(local_method, data, workers=worker))
+        worker = walkers[i % len(walkers)]
+        submitted.append(time.time())
+        tasks.append(submit_local_method(shared, chunks[i], defl_index, worker, refine))
+
+    gather_start = time.perf_counter()
+    results = shared.executor.gather(tasks)
+    if shared.metrics is not None:
+        shared.metrics.gather_time = time.perf_counter() - gather_start
+        received = time.time()
+        for i, result in enumerate(results): shared.metrics.add_task(submitted[i], received, result, chunks[i].nbytes)
+    for result in results:
+        shared.task_size.update(result[-1], len(result[0]))
+        shared.stopping.add_task(result)
+        record_samples(d, result)
+    return collect_local_results(results, dim, defl_index)
 
-    results = client.gather(tasks)
-    number_of_walkers = len(tasks)
+
+###########################################################################
+def submit_local_method(shared, x0, defl_index, worker, refine=False):
+    """
+    submits the deflated local optimizations starting at
+    x0 (2d numpy array of shape K x D) to the given worker,
+    with the tolerance of the current epoch or (refine) the final one
+    the future returns the packed results of local_method_batch
+    """
+    schedule = (shared.tolerance, shared.max_iter) if shared.coarse and not refine else None
+    return shared.executor.submit(local_method_batch, shared.metadata, x0, shared.get_deflation(defl_index),
+                                  shared.abort_value, schedule, worker=worker)
+
+
+###########################################################################
+def record_samples(d, result):
+    """
+    adds the evaluated points returned by a walker task to the archive of the meta data
+    """
+    if d.archive is not None and result[7] is not None: d.archive.add(*result[7])
+
+
+###########################################################################
+def pack_local_results(results, dim):
+    """
+    packs a list of results of local_method into arrays
+    return:
+        optima_locations, func values, gradients, eigenvalues, radii, local_success(bool)
+    """
+    number_of_walkers = len(results)
     x = np.empty((number_of_walkers, dim))
     f = np.empty((number_of_walkers))
     g = np.empty((number_of_walkers, dim))
     eig = np.empty((number_of_walkers, dim))
     r = np.empty((number_of_walkers))
     local_success = np.empty((number_of_walkers), dtype=bool)
+    for i in range(number_of_walkers):
+        x[i], f[i], g[i], e, r[i], local_success[i] = results[i]
+        e = np.atleast_1d(e)
+        # Hessian-free classification returns only the extreme eigenvalues
+        if len(e) in (1, dim): eig[i] = e
+        else: eig[i], eig[i, 0:len(e)] = np.nan, e
+    return x, f, g, eig, r, local_success
+
 
-    for i in range(len(tasks)):
-        x[i], f[i], g[i], eig[i], r[i], local_success[i] = results[i]
-        for j in range(i):
-            if np.linalg.norm(np.subtract(x[i], x[j])) < r[i] and local_success[j] == True:
-                logger.warning("points converged too close to each other in HGDL; point removed")
-                local_success[i] = False
-        for j in range(len(x_defl)):
-            if np.linalg.norm(np.subtract(x[i], x_defl[j])) < radii[j] and all(g[i] < 1e-5):
-                logger.warning("local method converged within 2 x radius of a deflated position in HGDL")
-                local_success[i] = False
+###########################################################################
+def collect_local_results(results, dim, defl_index, accepted=None):
+    """
+    concatenates the packed results of walker tasks and
+    removes walkers that converged too close to each other
+    or into the basin of a deflated position
+    input:
+        list of results of local_method_batch
+        the dimensionality of the space
+        deflation_index of the deflated positions
+        deflation_index of previously accepted walkers (optional, default = None)
+    return:
+        optima_locations, func values, gradient norms, eigenvalues, local_success(bool)
+    """
+    x, f, g, eig, r, local_success = [np.concatenate([result[i] for result in results]) for i in range(6)]
+
+    if accepted is None: accepted = deflation_index(dim)
+    for i in range(len(x)):
+        if accepted.within(x[i], r[i]):
+            logger.warning("points converged too close to each other in HGDL; point removed")
+            local_success[i] = False
+        if all(g[i] < 1e-5) and defl_index.in_basin(x[i]):
+            logger.warning("local method converged within 2 x radius of a deflated position in HGDL")
+            local_success[i] = False
+        if local_success[i]: accepted.add(x[i], r[i])
     return x, f, g, eig, r, local_success
 
 
+def local_method_batch(d, x0, defl_index, abort_value=np.inf, schedule=None):
+    """
+    runs the deflated local method for a batch of
+    starting positions x0 (2d numpy array of shape K x D)
+    one after the other; defl_index is a deflation_index or the reference
+    returned by shared_data.get_deflation; abort_value is the reference value
+    of early aborts (see early_abort.abort_value), schedule the
+    tolerance and iteration limit of a coarse epoch (None: the final ones)
+    return:
+        optima_locations, func values, gradients, eigenvalues, radii,
+        local_success(bool) as arrays of length K, the metrics of the task
+        (None if not collected), the evaluated points and their values
+        (downsampled; None if the meta data has no archive), the number of
+        function evaluations (None if not counted) and the runtime in seconds
+    """
+    start_time = time.perf_counter()
+    if isinstance(defl_index, tuple): defl_index = replica(*defl_index)
+    metrics, timers = None, None
+    if d.metrics:
+        metrics = {"start": time.time(), "walkers": []}
+        d, timers = instrument(d)
+    x0 = np.atleast_2d(x0)
+    if schedule is not None:
+        d = copy.copy(d)
+        d.tolerance, d.local_max_iter = schedule
+        # coarse results are accepted for refinement at any gradient if the Hessian is positive definite
+        if d.refine: d.gradient_gate = np.inf
+    counters = None
+    if d.max_evaluations is not None: d, counters = counted(d)
+    recorder, func = None, d.func
+    if d.archive is not None:
+        recorder = trajectory_recorder(d.samples_per_walker * len(x0))
+        d = copy.copy(d)
+        d.func = recorder.wrap(d.func)
+        if d.fun_and_grad is not None: d.fun_and_grad = recorder.wrap_fused(d.fun_and_grad)
+    if d.vectorized and d.local_optimizer == "dNewton":
+        results = vectorized_dNewton(d, x0, defl_index, recorder)
+    else:
+        if d.vectorized:
+            d = copy.copy(d)
+            d.func, d.grad, d.hess = [partial(_evaluate_point, function) for function in (d.func, d.grad, d.hess)]
+            d.hessp = _point_hessp(d)
+            if d.fun_and_grad is not None: d.fun_and_grad = partial(_evaluate_point_fused, d.fun_and_grad)
+        results = []
+        for x in x0:
+            data = {"d": d, "x0": x, "deflation": defl_index, "abort value": abort_value, "recorder": recorder}
+            if metrics is None:
+                results.append(local_method(data))
+                continue
+            before = {name: timer.snapshot() for name, timer in timers.items()}
+            data["info"], walker_start = {}, time.perf_counter()
+            results.append(local_method(data))
+            metrics["walkers"].append(dict(time=time.perf_counter() - walker_start, deflation_size=len(defl_index),
+                                           iterations=data["info"].get("iterations", -1), success=results[-1][5],
+                                           aborted=data["info"].get("aborted", False),
+                                           **call_columns(timers, before)))
+    if metrics is not None: metrics.update(end=time.time(), calls=call_columns(timers))
+    samples = None
+    if recorder is not None:
+        recorder.complete(func, d.vectorized, *d.args)
+        samples = recorder.samples(d.dim, d.archive.dtype)
+    evaluations = None if counters is None else sum(counter.count for counter in counters)
+    return *pack_local_results(results, d.dim), metrics, samples, evaluations, time.perf_counter() - start_time
+
+
+def _evaluate_point(function, x, *args):
+    return function(np.asarray(x)[None], *args)[0]
+
+
+def _evaluate_point_fused(function, x, *args):
+    f, g = function(np.asarray(x)[None], *args)
+    return f[0], np.asarray(g)[0]
+
+
+def _evaluate_point_product(function, x, p, *args):
+    return function(np.asarray(x)[None], np.asarray(p)[None], *args)[0]
+
+
+def _point_hessp(d):
+    """
+    the Hessian-vector product of point-wise evaluated callables;
+    d.grad has to be point-wise already
+    """
+    if d.hessp is None: return None
+    if isinstance(d.hessp, finite_difference_hessp): return finite_difference_hessp(d.grad, d.hessp.epsilon)
+    return partial(_evaluate_point_product, d.hessp)
+
+
+def eigenvalues(d, x, hess, defl_index):
+    """
+    the eigenvalues of the deflated Hessian at x (1d numpy array);
+    for classification="lanczos" only the smallest and the largest,
+    computed from Hessian-vector products
+    """
+    if d.classification == "lanczos":
+        matvec = defl.deflated_hessp_operator(x, *d.args, grad_func=d.grad, hessp_func=d.hessp, index=defl_index)
+        return extreme_eigenvalues(matvec, d.dim)
+    return np.linalg.eig(hess(x, *d.args))[0]
+
+
+def classify_result(g, eig, gradient_gate=1e-6):
+    """
+    returns the eigenvalues, the deflation radius 1/min(eig) and whether the
+    result is a minimum usable for deflation (gradient norm below gradient_gate);
+    otherwise the eigenvalues are replaced by [0.0] and the radius by 0.0
+    """
+    eig = np.real(eig)
+    if np.linalg.norm(g) < gradient_gate and np.nanmin(eig) > 1e-6: return eig, 1. / np.nanmin(eig), True
+    return np.array([0.0]), 0.0, False
+
+
+def vectorized_dNewton(d, x0, defl_index, recorder=None):
+    """
+    advances all walkers in x0 (2d numpy array of shape K x D) together
+    with vectorized func, grad and hess; the iterates are added to the
+    optional trajectory_recorder
+    return:
+        list of K results of local_method
+    """
+    grad = partial(defl.batched_deflated_grad, grad_func=d.grad, index=defl_index)
+    hess = partial(defl.batched_deflated_hess, grad_func=d.grad, hess_func=d.hess, index=defl_index)
+    point_eigenvalues = None
+    if d.classification == "lanczos":
+        point_d = copy.copy(d)
+        point_d.grad = partial(_evaluate_point, d.grad)
+        point_d.hessp = _point_hessp(point_d)
+        point_eigenvalues = lambda x: [eigenvalues(point_d, point, None, defl_index) for point in x]
+    x, f, g, eig, local_success = batched_DNewton(d.func, grad, hess, d.bounds, x0, d.local_max_iter,
+                                                  d.tolerance, *d.args, eigenvalues=point_eigenvalues,
+                                                  line_search=d.newton_line_search,
+                                                  callback=None if recorder is None else recorder.add)
+    results = []
+    for i in range(len(x0)):
+        eig_i, r, success = classify_result(g[i], eig[i], d.gradient_gate)
+        results.append((x[i], f[i], g[i], eig_i, r, success or local_success[i]))
+    return results
+
+
+def _recording(recorder, callback=None):
+    """
+    returns a callback adding x to the recorder before calling callback
+    """
+    def recorded(x):
+        recorder.add(x)
+        if callback is not None: return callback(x)
+    return recorded
+
+
+def cached(d):
+    """
+    returns a copy of the meta data whose func, grad and hess share
+    one evaluation_cache, so every point is evaluated only once
+    """
+    cache = evaluation_cache(d.func, d.grad, d.hess, d.fun_and_grad, d.cache_size)
+    d = copy.copy(d)
+    d.func, d.grad, d.hess = cache.func, cache.grad, cache.hess
+    return d
+
+
 def local_method(data, method="dNewton"):
-    from functools import partial
     d = data["d"]
+    if d.cache_size: d = cached(d)
     x0 = np.array(data["x0"])
     e = np.inf
     local_success = False
     tol = d.tolerance
-    x_defl = data["x_defl"]
-    r_defl = data["radius"]
+    defl_index = data["deflation"]
     bounds = d.bounds
     max_iter = d.local_max_iter
     args = d.args
     method = d.local_optimizer
     constr = d.constr
     # augment grad, hess
-    grad = partial(defl.deflated_grad, grad_func=d.grad, x_defl=x_defl, radius=r_defl)
-    hess = partial(defl.deflated_hess, grad_func=d.grad, hess_func=d.hess, x_defl=x_defl, radius=r_defl)
+    grad = partial(defl.deflated_grad, grad_func=d.grad, index=defl_index)
+    hess = partial(defl.deflated_hess, grad_func=d.grad, hess_func=d.hess, index=defl_index)
+    # Hessian-free: second-order scipy methods get deflated Hessian-vector products
+    hessians = {"hess": hess}
+    if d.classification == "lanczos":
+        hessians = {"hessp": partial(defl.deflated_hessp, grad_func=d.grad, hessp_func=d.hessp, index=defl_index)}
+
+    # walkers entering a deflated basin or stalling at poor values are aborted
+    monitor = abort_monitor(d, defl_index, data.get("abort value", np.inf)) if d.abort_interval else None
+    callback = None if monitor is None else monitor.callback
+    # dNewton evaluates func only at its result; its iterates are recorded without values
+    if method == "dNewton" and data.get("recorder") is not None: callback = _recording(data["recorder"], callback)
 
     # call local methods
-    if method == "dNewton":
-        x, f, g, eig, local_success = DNewton(d.func, grad, hess, bounds, x0, max_iter, tol, *args)
-        if np.linalg.norm(g) < 1e-6 and np.min(eig) > 1e-6:
-            local_success = True
-            r = 1. / np.min(eig)
-        else:
-            eig = np.array([0.0])
-            r = 0.0
-
-    elif type(method) == str:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            res = minimize(d.func, x0, args=args, method=method, jac=grad, hess=hess,
-            bounds=bounds, constraints=constr, tol = tol, options={"disp": False})
-        x = res["x"]
-        f = res["fun"]
-        g = res["jac"]
-        eig = np.linalg.eig(hess(x, *args))[0]
-
-        if np.linalg.norm(g) < 1e-6 and np.min(eig) > 1e-6:
-            local_success = True
-            r = 1. / np.min(eig)
-        else:
-            eig = np.array([0.0])
-            r = 0.0
-
-
-    elif callable(method):
-        res = method(d.func, grad, hess, bounds, x0, *args)
-        x = res["x"]
-        f = res["fun"]
-        g = res["jac"]
-        if np.linalg.norm(g) < 1e-6 and np.min(eig) > 1e-6:
-            local_success = True
-            eig = np.linalg.eig(hess(x, *args))[0]
-            r = 1. / np.min(eig)
-        else:
-            eig = np.array([0.0])
-            r = 0.0
+    try:
+        if method == "dNewton":
+            # the dense classification reuses the last Hessian of the Newton iterations
+            point_eigenvalues = None
+            if d.classification == "lanczos": point_eigenvalues = partial(eigenvalues, d, hess=hess, defl_index=defl_index)
+            x, f, g, eig, local_success = DNewton(d.func, grad, hess, bounds, x0, max_iter, tol, *args,
+                                                  eigenvalues=point_eigenvalues, callback=callback,
+                                                  line_search=d.newton_line_search, info=data.get("info"))
 
-    else:
-        raise Exception("no local method specified")
+        elif type(method) == str:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                res = minimize(d.func, x0, args=args, method=method, jac=grad, **hessians,
+                bounds=bounds, constraints=constr, tol = tol, callback=callback, options={"disp": False})
+            x = res["x"]
+            f = res["fun"]
+            g = res["jac"]
+            eig = eigenvalues(d, x, hess, defl_index)
+
+        elif callable(method):
+            res = method(d.func, grad, hess, bounds, x0, *args)
+            x = res["x"]
+            f = res["fun"]
+            g = res["jac"]
+            eig = eigenvalues(d, x, hess, defl_index)
+
+        else:
+            raise Exception("no local method specified")
+    except walker_aborted as aborted:
+        if "info" in data: data["info"].update(iterations=monitor.iterations, aborted=True)
+        return aborted.x, d.func(aborted.x, *args), grad(aborted.x, *args), np.array([0.0]), 0.0, False
 
+    if "info" in data and method != "dNewton": data["info"]["iterations"] = res.get("nit", -1)
+    eig, r, success = classify_result(g, eig, d.gradient_gate)
+    local_success = local_success or success
     return x, f, g, np.real(eig), np.abs(r), local_success
 ###########################################################################
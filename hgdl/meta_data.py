@@ -9,6 +9,10 @@ class meta_data:
         self.func = obj.func
         self.grad = obj.grad
         self.hess = obj.hess
+        self.fun_and_grad = obj.fun_and_grad
+        self.cache_size = obj.cache_size
+        self.hessp = obj.hessp
+        self.classification = obj.classification
         self.bounds = obj.bounds
         self.dim = obj.dim
 
@@ -16,7 +20,30 @@ class meta_data:
         self.number_of_walkers = obj.number_of_walkers
         self.num_epochs = obj.num_epochs
         self.global_optimizer = obj.global_optimizer
+        self.sampler = obj.sampler
+        self.archive = obj.archive
+        self.samples_per_walker = obj.samples_per_walker
+        self.tabu_radius = obj.tabu_radius
+        self.surrogate = obj.surrogate
         self.local_optimizer = obj.local_optimizer
+        self.newton_line_search = obj.newton_line_search
         self.args = obj.args
         self.tolerance = obj.tolerance
+        self.tolerance_schedule = obj.tolerance_schedule
+        self.max_iter_schedule = obj.max_iter_schedule
+        self.refine = obj.refine
+        self.max_time = obj.max_time
+        self.max_evaluations = obj.max_evaluations
+        self.stagnation_epochs = obj.stagnation_epochs
+        self.stagnation_rank = obj.stagnation_rank
+        self.gradient_gate = 1e-6
         self.constr = obj.constraints
+        self.scheduling = obj.scheduling
+        self.chunk_size = obj.chunk_size
+        self.target_task_time = obj.target_task_time
+        self.vectorized = obj.vectorized
+        self.metrics = obj.metrics
+        self.abort_interval = obj.abort_interval
+        self.abort_rank = obj.abort_rank
+        self.abort_margin = obj.abort_margin
+        self.abort_stall = obj.abort_stall
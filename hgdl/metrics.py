@@ -0,0 +1,155 @@
+"""
+Performance metrics of a run, collected if HGDL is initialized with metrics=True.
+The host keeps three columnar tables:
+    epochs ... one row per epoch (epoch mode only)
+    tasks ... one row per walker task
+    walkers ... one row per local optimization (not for vectorized dNewton,
+                whose walkers share the callables; see the tasks table)
+New rows are sent to the client together with the optima and are
+returned by HGDL.get_metrics() as dictionaries of numpy arrays.
+Times are in seconds. The global_step_time of an epoch includes the global
+step proposing the walkers of the next epoch; deflation_bytes is the size of
+the deflation points (new bases and deltas) sent during the epoch. The latencies of a
+task are measured with the clocks of the host and of the walker's worker.
+"""
+import copy
+import time
+
+import numpy as np
+
+CALLABLES = ("func", "grad", "hess")
+CALL_FIELDS = tuple(f"{name}_{column}" for name in CALLABLES for column in ("calls", "time"))
+EPOCH_FIELDS = ("epoch", "time", "global_step_time", "local_time", "gather_time", "fill_time",
+                "number_of_walkers", "number_of_optima", "deflation_size", "deflation_bytes")
+TASK_FIELDS = ("task", "epoch", "number_of_walkers", "queue_latency", "run_time", "result_latency",
+               "bytes_sent", "bytes_received") + CALL_FIELDS
+WALKER_FIELDS = ("task", "time", "iterations", "deflation_size", "success", "aborted") + CALL_FIELDS
+
+
+class call_timer:
+    """
+    counts the calls of a callable and their accumulated time
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+        self.time = 0.0
+
+    def __call__(self, x, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.function(x, *args, **kwargs)
+        finally:
+            self.calls += 1
+            self.time += time.perf_counter() - start
+
+    def snapshot(self):
+        return self.calls, self.time
+
+
+def instrument(d):
+    """
+    returns a copy of the meta data with timed func, grad and hess
+    (a fused fun_and_grad is counted as func) and the timers
+    """
+    timers = {name: call_timer(getattr(d, name)) for name in CALLABLES}
+    d = copy.copy(d)
+    for name in CALLABLES: setattr(d, name, timers[name])
+    if d.fun_and_grad is not None: d.fun_and_grad = timers["func"] = call_timer(d.fun_and_grad)
+    return d, timers
+
+
+def call_columns(timers, before=None):
+    """
+    returns the columns of CALL_FIELDS, counted since the snapshot before
+    """
+    row = {}
+    for name in CALLABLES:
+        number, seconds = timers[name].snapshot()
+        if before is not None: number, seconds = number - before[name][0], seconds - before[name][1]
+        row[f"{name}_calls"], row[f"{name}_time"] = number, seconds
+    return row
+
+
+###########################################################################
+class metrics_table:
+    """
+    a columnar table; rows are appended as keyword arguments,
+    missing columns are filled with NaN
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.columns = {field: [] for field in fields}
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def append(self, **row):
+        for field in self.fields: self.columns[field].append(row.get(field, np.nan))
+
+    def add_to_last(self, **row):
+        for field, value in row.items(): self.columns[field][-1] += value
+
+    def extend(self, columns):
+        for field in self.fields: self.columns[field].extend(columns[field])
+
+    def take(self):
+        """
+        returns the rows appended since the last call and removes them
+        """
+        columns = self.columns
+        self.columns = {field: [] for field in self.fields}
+        return columns
+
+    def as_arrays(self):
+        return {field: np.array(values) for field, values in self.columns.items()}
+
+
+###########################################################################
+class run_metrics:
+    """
+    the epochs, tasks and walkers tables of a run
+    """
+
+    def __init__(self, queue=None):
+        self.tables = {"epochs": metrics_table(EPOCH_FIELDS),
+                       "tasks": metrics_table(TASK_FIELDS),
+                       "walkers": metrics_table(WALKER_FIELDS)}
+        self.queue = queue
+        self.epoch = -1
+        self.number_of_tasks = 0
+        self.gather_time = 0.0
+        self.deflation_bytes = 0
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def add_task(self, submitted, received, result, bytes_sent):
+        """
+        records a finished task from its submission and reception times (time.time()),
+        its result (of local_method_batch) and the size of its input
+        """
+        task = self.number_of_tasks
+        self.number_of_tasks += 1
+        metrics = result[6]
+        self.tables["tasks"].append(task=task, epoch=self.epoch, number_of_walkers=len(result[0]),
+                                    queue_latency=metrics["start"] - submitted,
+                                    run_time=metrics["end"] - metrics["start"],
+                                    result_latency=received - metrics["end"],
+                                    bytes_sent=bytes_sent,
+                                    bytes_received=sum(np.asarray(a).nbytes for a in result[0:6])
+                                    + sum(a.nbytes for a in result[7] or ()),
+                                    **metrics["calls"])
+        for row in metrics["walkers"]: self.tables["walkers"].append(task=task, **row)
+
+    def publish(self):
+        if self.queue is None or not any(len(table) for table in self.tables.values()): return
+        self.queue.put({name: table.take() for name, table in self.tables.items()})
+
+    def apply(self, update):
+        for name, columns in update.items(): self.tables[name].extend(columns)
+
+    def as_arrays(self):
+        return {name: table.as_arrays() for name, table in self.tables.items()}
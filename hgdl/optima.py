@@ -2,11 +2,25 @@ import numpy as np
 
 from loguru import logger
 
+from .deflation_index import deflation_index
+
+MINIMUM, MAXIMUM, SADDLE_POINT, ZERO_CURVATURE, DEGENERATE, ERROR = range(6)
+CLASSIFIERS = ("minimum", "maximum", "saddle point", "zero curvature", "degenerate", "ERROR")
+DEFLATION_CLASSES = (MINIMUM, MAXIMUM, SADDLE_POINT)
+
 
 class optima:
     """
     stores all results and adaptations of it
+
+    The optima are kept sorted by function value in preallocated arrays
+    (x, f, grad, eigvals, radius and an integer classifier code, see CLASSIFIERS).
+    The capacity grows by doubling up to max_optima.
+    Every stored optimum is also appended to a log; version counts the logged
+    optima, so copies of the store can be kept up to date with get_delta()
+    and apply_delta().
     """
+    _fields = ("x", "f", "grad", "eigvals", "radius", "classifier")
 
     def __init__(self, dim_x, max_optima):
         """
@@ -18,9 +32,63 @@ class optima:
 
         self.dim_x = dim_x
         self.max_optima = max_optima
-        self.list = []
+        self.size = 0
+        self.version = 0
+        self._log = []
+        self._allocate(min(max_optima, 1024))
+        self.deflation_index = deflation_index(dim_x)
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._fields: state[name] = state[name][:self.size]
+        return state
 
     ####################################################
+    def _allocate(self, capacity):
+        old = {name: getattr(self, name) for name in self._fields} if hasattr(self, "f") else None
+        self.x = np.empty((capacity, self.dim_x))
+        self.f = np.empty((capacity))
+        self.grad = np.empty((capacity, self.dim_x))
+        self.eigvals = np.empty((capacity, self.dim_x))
+        self.radius = np.empty((capacity))
+        self.classifier = np.empty((capacity), dtype=np.int8)
+        if old is not None:
+            for name in self._fields: getattr(self, name)[:self.size] = old[name][:self.size]
+
+    def _reserve(self, size):
+        capacity = max(len(self.f), 1)
+        if size <= len(self.f): return
+        while capacity < size: capacity *= 2
+        self._allocate(min(capacity, self.max_optima))
+
+    ####################################################
+    @property
+    def list(self):
+        """
+        the stored optima as a sorted list of dictionaries
+        """
+        return self.get_entries(self.size)
+
+    def get_entries(self, n, mask=None):
+        indices = np.arange(self.size) if mask is None else np.where(mask)[0]
+        indices = indices[0:min(n, len(indices))]
+        x, f, grad = self.x[indices], self.f[indices], self.grad[indices]
+        eigvals, radius, classifier = self.eigvals[indices], self.radius[indices], self.classifier[indices]
+        grad_norm = np.linalg.norm(grad, axis=1)
+        return [self.make_optima_list_entry(x[i], f[i], CLASSIFIERS[classifier[i]], eigvals[i], grad[i],
+                                            grad_norm[i], radius[i]) for i in range(len(indices))]
+
+    def delta_entries(self, delta):
+        """
+        the optima of a delta (see get_delta) as a list of dictionaries
+        """
+        grad_norm = np.linalg.norm(delta["grad"], axis=1)
+        return [self.make_optima_list_entry(delta["x"][i], delta["f"][i], CLASSIFIERS[delta["classifier"][i]],
+                                            delta["eigvals"][i], delta["grad"][i], grad_norm[i], delta["radius"][i])
+                for i in range(len(delta["f"]))]
 
     def make_optima_list_entry(self, x, f, classifier, eigs, grad, grad_norm, r):
         list_entry = {"x": x,
@@ -33,79 +101,123 @@ class optima:
 
         return list_entry
 
+    ####################################################
+    @staticmethod
+    def classify(g, eig):
+        """
+        vectorized classification of the optima
+        input:
+        -----
+            g ... 2d numpy array of gradients
+            eig ... 2d numpy array of Hessian eigenvalues; NaN entries are
+                    ignored (Hessian-free classification stores only the extremes)
+        return:
+        -----
+            1d numpy array of classifier codes (indices into CLASSIFIERS)
+        """
+        eig = np.asarray(eig, dtype=float).reshape(len(g), -1)
+        known = ~np.all(np.isnan(eig), axis=1)
+        eig_min = np.min(np.where(np.isnan(eig), np.inf, eig), axis=1)
+        eig_max = np.max(np.where(np.isnan(eig), -np.inf, eig), axis=1)
+        classifier = np.full((len(g)), ERROR, dtype=np.int8)
+        classifier[known & (eig_min < 0.0) & (eig_max > 0.0)] = SADDLE_POINT
+        classifier[known & (eig_max < 0.0)] = MAXIMUM
+        classifier[known & (eig_min > 0.0)] = MINIMUM
+        classifier[np.any(np.abs(eig) < 10e-6, axis=1)] = ZERO_CURVATURE
+        classifier[np.any(g > 1e-3, axis=1)] = DEGENERATE
+        return classifier
+
     def fill_in_optima_list(self, res):
         x, f, g, eig, r, local_success = res[0], res[1], res[2], res[3], res[4], res[5]
-        if not np.any(local_success) and len(self.list) == 0: local_success[:] = True
-        clean_indices = np.where(np.asarray(local_success) == True)[0]
-        if len(clean_indices) == 0: return self.list
-
-        clean_x = x[clean_indices]
-        clean_f = f[clean_indices]
-        clean_g = g[clean_indices]
-        clean_eig = eig[clean_indices]
-        clean_radii = r[clean_indices]
-        classifier = []
-        ##making the classifier
-        for i in range(len(clean_x)):
-            if any(clean_g[i] > 1e-3):
-                classifier.append("degenerate")
-            elif any(abs(clean_eig[i]) < 10e-6):
-                classifier.append("zero curvature")
-            elif all(clean_eig[i] > 0.0):
-                classifier.append("minimum")
-            elif all(clean_eig[i] < 0.0):
-                classifier.append("maximum")
-            elif abs(np.max(np.sign(clean_eig[i])) - np.min(np.sign(clean_eig[i]))) == 2:
-                classifier.append("saddle point")
-            else:
-                classifier.append("ERROR")
-
-        new_optima_list = []
-        for i in range(len(clean_x)):
-            new_optima_list.append(
-                self.make_optima_list_entry(clean_x[i], clean_f[i], classifier[i], clean_eig[i], clean_g[i],
-                                            np.linalg.norm(clean_g[i]), clean_radii[i]))
-        optima_list = self.list + new_optima_list
-
-        def find_f(d): return d["f(x)"]
-
-        optima_list.sort(key=find_f)
-        self.list = optima_list[0:self.max_optima]
-        return self.list
+        local_success = np.array(local_success, dtype=bool)
+        if not np.any(local_success) and self.size == 0: local_success[:] = True
+        clean_indices = np.where(local_success)[0]
+        if len(clean_indices) == 0: return 0
+
+        clean_g = np.asarray(g)[clean_indices]
+        clean_eig = np.asarray(eig)[clean_indices]
+        return self.merge(np.asarray(x)[clean_indices], np.asarray(f)[clean_indices], clean_g, clean_eig,
+                          np.asarray(r)[clean_indices], self.classify(clean_g, clean_eig))
 
+    def merge(self, x, f, g, eig, r, classifier, log=True):
+        """
+        merges new optima into the sorted store
+        the return is the number of stored new optima
+        """
+        if len(f) == 0: return 0
+        order = np.argsort(f, kind="stable")
+        new = dict(zip(self._fields, (x[order], f[order], g[order], eig[order], r[order], classifier[order])))
+        n, k = self.size, len(order)
+        pos = np.searchsorted(self.f[:n], new["f"], side="right")
+        new_dest = pos + np.arange(k)
+        old = np.arange(pos[0], n)
+        old_dest = old + np.searchsorted(pos, old, side="right")
+        size = min(n + k, self.max_optima)
+        self._reserve(size)
+
+        keep_old, keep_new = old_dest < size, new_dest < size
+        evicted = np.isin(self.classifier[old[~keep_old]], DEFLATION_CLASSES)
+        for name in self._fields:
+            a = getattr(self, name)
+            a[old_dest[keep_old]] = a[old[keep_old]]
+            a[new_dest[keep_new]] = new[name][keep_new]
+        self.size = size
+
+        if np.any(evicted):
+            defl_x, defl_f, defl_r = self.get_deflation_points(self.size)
+            self.deflation_index.rebuild(defl_x, defl_r)
+        else:
+            defl = keep_new & np.isin(new["classifier"], DEFLATION_CLASSES)
+            self.deflation_index.add(new["x"][defl], new["radius"][defl])
+        number_stored = int(np.sum(keep_new))
+        if log and number_stored:
+            self._log.append({name: new[name][keep_new] for name in self._fields})
+            self.version += number_stored
+        return number_stored
+
+    ####################################################
+    def get_delta(self):
+        """
+        returns the optima stored since the last call as a dictionary of
+        numpy arrays (one per field) plus the version after the last entry,
+        or None if nothing new was stored
+        """
+        if not self._log: return None
+        delta = {name: np.concatenate([entries[name] for entries in self._log]) for name in self._fields}
+        delta["version"] = self.version
+        self._log = []
+        return delta
+
+    def apply_delta(self, delta):
+        """
+        merges a delta from get_delta() of another store, skipping entries
+        that are already included in this copy
+        """
+        start = delta["version"] - len(delta["f"])
+        if start > self.version:
+            logger.warning("optima versions {} to {} are missing in this copy", self.version, start)
+        skip = max(self.version - start, 0)
+        if skip < len(delta["f"]):
+            self.merge(*(delta[name][skip:] for name in self._fields), log=False)
+        self.version = max(self.version, delta["version"])
+
+    ####################################################
     def get_minima(self, n):
-        try:
-            minima_list = [entry for entry in self.list if entry["classifier"] == "minimum"]
-            minima_list = minima_list[0:min(n, len(minima_list))]
-            return minima_list
-        except:
-            logger.debug("no minima available in the optima_list")
-            return None
+        minima_list = self.get_entries(n, self.classifier[:self.size] == MINIMUM)
+        if not minima_list: logger.debug("no minima available in the optima_list")
+        return minima_list
 
     ####################################################
     def get_maxima(self, n):
-        try:
-            maxima_list = [entry for entry in self.list if entry["classifier"] == "maximum"]
-            maxima_list = maxima_list[0:min(n, len(maxima_list))]
-            return maxima_list
-        except:
-            logger.debug("no maxima available in the optima_list")
-            return None
+        maxima_list = self.get_entries(n, self.classifier[:self.size] == MAXIMUM)
+        if not maxima_list: logger.debug("no maxima available in the optima_list")
+        return maxima_list
 
     ####################################################
     def get_deflation_points(self, n):
-        try:
-            defl_list = [entry for entry in self.list if
-                         entry["classifier"] == "maximum" or entry["classifier"] == "minimum" or entry[
-                             "classifier"] == "saddle point"]
-            defl_x = [entry["x"] for entry in defl_list]
-            defl_f = [entry["f(x)"] for entry in defl_list]
-            defl_r = [entry["radius"] for entry in defl_list]
-
-            return defl_x, defl_f, defl_r
-        except Exception as e:
-            logger.debug("no deflation points available in the optima_list")
-            return [], [], []
+        indices = np.where(np.isin(self.classifier[:self.size], DEFLATION_CLASSES))[0][0:n]
+        if len(indices) == 0: logger.debug("no deflation points available in the optima_list")
+        return self.x[indices], self.f[indices], self.radius[indices]
 
 #########################################################
 #########################################################
@@ -0,0 +1,106 @@
+import copy
+import time
+
+import numpy as np
+
+from .finite_differences import finite_difference_hessian, finite_difference_hessp
+
+# the user's callables whose evaluations count towards max_evaluations
+COUNTED = ("func", "grad", "hess", "hessp", "fun_and_grad")
+
+
+class evaluation_counter:
+    """
+    counts the evaluations of a callable; for vectorized callables
+    every point (row of x) is counted
+    """
+
+    def __init__(self, function, vectorized=False):
+        self.function = function
+        self.vectorized = vectorized
+        self.count = 0
+
+    def __call__(self, x, *args):
+        self.count += len(x) if self.vectorized and np.ndim(x) == 2 else 1
+        return self.function(x, *args)
+
+
+def counted(d):
+    """
+    returns a copy of the meta data whose callables (see COUNTED) count their
+    evaluations, and the counters; finite difference Hessians and Hessian-vector
+    products are counted through the gradients they evaluate
+    """
+    d = copy.copy(d)
+    counters = []
+    for name in COUNTED:
+        function = getattr(d, name)
+        if function is None: continue
+        if isinstance(function, (finite_difference_hessian, finite_difference_hessp)):
+            function = copy.copy(function)
+            function.grad = evaluation_counter(function.grad, d.vectorized)
+            counters.append(function.grad)
+        else:
+            function = evaluation_counter(function, d.vectorized)
+            counters.append(function)
+        setattr(d, name, function)
+    return d, counters
+
+
+###########################################################################
+class stopping_criteria:
+    """
+    the budgets of a run, checked by the host between epochs (in steady state
+    mode: after every walker task):
+        max_time ... wall-clock seconds since the start of the host loop; in epoch
+                     mode no epoch is started that would end after max_time
+                     if it took as long as the previous one
+        max_evaluations ... function evaluations of all walkers
+        stagnation_epochs ... number of epochs (windows of number of walkers
+                     results in steady state mode) without a new optimum among
+                     the stagnation_rank best ones
+    check() returns the reason to stop (the name of the criterion) or None
+    and keeps it in reason.
+    """
+
+    def __init__(self, d):
+        self.max_time = d.max_time
+        self.max_evaluations = d.max_evaluations
+        self.stagnation_epochs = d.stagnation_epochs
+        self.stagnation_rank = d.stagnation_rank
+        self.start = time.perf_counter()
+        self.epoch_start = self.start
+        self.epoch_time = 0.0
+        self.evaluations = 0
+        self.stagnant = 0
+        self.top = None
+        self.reason = None
+
+    def add_task(self, result):
+        """
+        adds the function evaluations of a finished task (result of local_method_batch)
+        """
+        if result[8] is not None: self.evaluations += result[8]
+
+    def end_epoch(self, optima):
+        """
+        records the end of an epoch and whether it changed the best optima
+        """
+        now = time.perf_counter()
+        self.epoch_time, self.epoch_start = now - self.epoch_start, now
+        top = np.array(optima.f[0:min(optima.size, self.stagnation_rank)])
+        if self.top is not None and np.array_equal(top, self.top): self.stagnant += 1
+        else: self.stagnant = 0
+        self.top = top
+
+    def check(self, predict=False):
+        """
+        returns the name of the first exhausted budget or None;
+        with predict the time of the next epoch is included
+        """
+        elapsed = time.perf_counter() - self.start + (self.epoch_time if predict else 0.0)
+        if self.max_time is not None and elapsed >= self.max_time: self.reason = "max_time"
+        elif self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            self.reason = "max_evaluations"
+        elif self.stagnation_epochs is not None and self.stagnant >= self.stagnation_epochs: self.reason = "stagnation"
+        return self.reason
@@ -12,6 +12,40 @@ def schwefel_gradient(x, *args):
     return -(np.sin(np.sqrt(np.abs(x))) + (x * np.cos(np.sqrt(np.abs(x))) * (0.5 / np.sqrt(np.abs(x))) * (np.sign(x))))
 
 
+###########################################################################
+def rastrigin(x, *args):
+    return 10.0 * len(x) + np.sum(x ** 2 - 10.0 * np.cos(2.0 * np.pi * x))
+
+
+###########################################################################
+def rastrigin_gradient(x, *args):
+    return 2.0 * x + 20.0 * np.pi * np.sin(2.0 * np.pi * x)
+
+
+###########################################################################
+def ackley(x, *args):
+    r = np.sqrt(np.mean(x ** 2))
+    return -20.0 * np.exp(-0.2 * r) - np.exp(np.mean(np.cos(2.0 * np.pi * x))) + 20.0 + np.e
+
+
+###########################################################################
+def ackley_gradient(x, *args):
+    r = np.sqrt(np.mean(x ** 2))
+    g = (2.0 * np.pi / len(x)) * np.sin(2.0 * np.pi * x) * np.exp(np.mean(np.cos(2.0 * np.pi * x)))
+    if r > 0.0: g = g + 4.0 * np.exp(-0.2 * r) * x / (len(x) * r)
+    return g
+
+
+###########################################################################
+def styblinski_tang(x, *args):
+    return 0.5 * np.sum(x ** 4 - 16.0 * x ** 2 + 5.0 * x)
+
+
+###########################################################################
+def styblinski_tang_gradient(x, *args):
+    return 0.5 * (4.0 * x ** 3 - 32.0 * x + 5.0)
+
+
 ###########################################################################
 def non_diff(x):
     p = np.array([2, 2])
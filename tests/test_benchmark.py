@@ -0,0 +1,21 @@
+import json
+
+import numpy as np
+from hgdl.benchmark import problems, main
+
+
+def test_known_minima():
+    for name, problem in problems.items():
+        x, f = problem.known_minima(2)
+        assert np.all(np.diff(f) >= 0)
+        assert all(np.linalg.norm(problem.grad(point.copy())) < 1e-4 for point in x), name
+    assert len(problems["styblinski-tang"].known_minima(3)[0]) == 8
+
+
+def test_benchmark_cli(tmp_path):
+    output = tmp_path / "benchmark.jsonl"
+    main(["--functions", "styblinski-tang", "--dims", "2", "--local-optimizers", "L-BFGS-B",
+          "--global-optimizers", "random", "--epochs", "3", "--walkers", "4", "--output", str(output)])
+    result = json.loads(output.read_text())
+    assert result["known_minima"] == 4 and 0.0 < result["recall"] <= 1.0
+    assert result["grad_evaluations"] > 0 and result["time_to_k_optima"]["1"] is not None
@@ -0,0 +1,43 @@
+import numpy as np
+from hgdl.hgdl import HGDL
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "hgdl.ckpt")
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, local_optimizer="L-BFGS-B", num_epochs=3)
+    a.optimize(executor="threads", number_of_walkers=4, checkpoint_path=path)
+    res = a.get_final()
+    a.kill_client()
+
+    calls = [0]
+
+    def counted_gradient(x):
+        calls[0] += 1
+        return schwefel_gradient(x)
+
+    b = HGDL(schwefel, counted_gradient, bounds, local_optimizer="L-BFGS-B", num_epochs=3)
+    b.resume(path, executor="threads")
+    assert [e["f(x)"] for e in b.get_final()] == [e["f(x)"] for e in res]
+    assert calls[0] == 0
+    b.kill_client()
+
+    c = HGDL(schwefel, counted_gradient, bounds, local_optimizer="L-BFGS-B", num_epochs=5)
+    c.resume(path, executor="threads")
+    assert len(c.get_final()) >= len(res)
+    assert calls[0] > 0
+    c.kill_client()
+
+
+def test_checkpoint_resume_steady_state(tmp_path):
+    path = str(tmp_path / "hgdl.ckpt")
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=2, scheduling="steady state")
+    a.optimize(executor="threads", number_of_walkers=4, checkpoint_path=path)
+    res = a.get_final()
+    a.kill_client()
+    b = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=4, scheduling="steady state")
+    b.resume(path, executor="threads")
+    assert len(b.get_final()) >= len(res) > 0
+    b.kill_client()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from hgdl.local_methods.dNewton import DNewton, batched_DNewton
+
+
+def func(x): return np.sum(np.sqrt(1.0 + x ** 2), axis=-1)
+def grad(x): return x / np.sqrt(1.0 + x ** 2)
+def hess(x): return np.eye(x.shape[-1]) * (1.0 + x ** 2)[..., None] ** -1.5
+
+
+class counted:
+    def __init__(self, function):
+        self.function, self.calls = function, 0
+
+    def __call__(self, x):
+        self.calls += 1
+        return self.function(x)
+
+
+def test_line_search():
+    bounds = np.array([[-100.0, 100.0]])
+    x0 = np.array([3.0])
+    # full Newton steps x -> -x^3 diverge for |x| > 1
+    x, f, g, eig, success = DNewton(func, grad, hess, bounds, x0, 100, 1e-10)
+    assert not success
+
+    counted_hess, info = counted(hess), {}
+    x, f, g, eig, success = DNewton(func, grad, counted_hess, bounds, x0, 100, 1e-10, line_search=True, info=info)
+    assert success and np.allclose(x, 0.0) and np.allclose(eig, 1.0)
+    # the eigenvalues at the result come from the last Hessian of the iterations
+    assert counted_hess.calls == info["iterations"]
+
+
+def test_batched_line_search():
+    bounds = np.array([[-100.0, 100.0]])
+    x0 = np.array([[3.0], [0.5], [-4.0]])
+    x, f, g, eig, success = batched_DNewton(func, grad, hess, bounds, x0, 100, 1e-10, line_search=True)
+    assert np.all(success) and np.allclose(x, 0.0) and np.allclose(np.real(eig), 1.0)
+
+
+def test_exit_step():
+    bounds = np.array([[-5.0, 5.0]])
+    x0 = np.array([3.0])
+    # the full Newton step from 3 ends at -27; the exit step at max_iter is projected or damped
+    x, f, g, eig, success = DNewton(func, grad, hess, bounds, x0, 0, 1e-10)
+    assert np.allclose(x, -5.0)
+    x, f, g, eig, success = DNewton(func, grad, hess, bounds, x0, 0, 1e-10, line_search=True)
+    assert abs(x[0]) < 3.0 and np.allclose(g, grad(x))
+    x, f, g, eig, success = batched_DNewton(func, grad, hess, bounds, x0[None], 0, 1e-10)
+    assert np.allclose(x, -5.0)
+    x, f, g, eig, success = batched_DNewton(func, grad, hess, bounds, x0[None], 0, 1e-10, line_search=True)
+    assert abs(x[0, 0]) < 3.0 and np.allclose(g, grad(x))
+
+
+@pytest.mark.parametrize("max_iter", [0, 2, 100])
+@pytest.mark.parametrize("line_search", [False, True])
+def test_batched_parity(max_iter, line_search):
+    bounds = np.array([[-100.0, 100.0], [-100.0, 100.0]])
+    x0 = np.array([[3.0, 0.5], [0.5, -0.2], [-4.0, 1.0]])
+    batched_info = {}
+    batched = batched_DNewton(func, grad, hess, bounds, x0, max_iter, 1e-10, line_search=line_search, info=batched_info)
+    for i in range(len(x0)):
+        info = {}
+        x, f, g, eig, success = DNewton(func, grad, hess, bounds, x0[i], max_iter, 1e-10, line_search=line_search,
+                                        info=info)
+        # both stop after the same number of Newton iterations at the same point
+        assert batched_info["iterations"][i] == info["iterations"]
+        assert np.allclose(batched[0][i], x) and batched[4][i] == success
@@ -0,0 +1,73 @@
+import pickle
+import numpy as np
+from hgdl.local_methods import bump_function as defl
+
+
+def test_deflation_kernel():
+    rng = np.random.default_rng(42)
+    x = rng.uniform(-1., 1., 3)
+    x_defl = np.vstack([x + 0.05, x - 0.1, rng.uniform(5., 6., (20, 3))])
+    radius = rng.uniform(0.5, 1.0, len(x_defl))
+
+    s1 = sum(defl.b(x, x_defl[i], radius[i]) for i in range(len(x_defl)))
+    s2 = sum(defl.b_grad(x, x_defl[i], radius[i]) for i in range(len(x_defl)))
+    d, dg = defl.deflation_kernel(x, x_defl, radius)
+    assert np.isclose(d, 1.0 / (1.0 - s1))
+    assert np.allclose(dg, s2 / (1.0 - s1) ** 2)
+
+    d, dg = defl.deflation_kernel(x, [], [])
+    assert d == 1.0 and not np.any(dg)
+
+
+def test_deflation_index():
+    from hgdl.deflation_index import deflation_index
+    rng = np.random.default_rng(0)
+    index = deflation_index(2, buffer_size=16)
+    x_defl = rng.uniform(-10., 10., (300, 2))
+    radius = rng.uniform(0.1, 1.0, 300)
+    # one large bump must not widen the queries of the other levels, but must still be found
+    radius[5] = 8.0
+    for i in range(0, 300, 7):
+        index.add(x_defl[i:i + 7], radius[i:i + 7])
+    assert len(index) == 300
+    assert sum(level[3] == 8.0 for level in index._levels) == 1
+    index = pickle.loads(pickle.dumps(index))
+
+    for x in rng.uniform(-10., 10., (50, 2)):
+        dist = np.linalg.norm(x_defl - x, axis=1)
+        assert set(index.overlapping(x)) == set(np.where(dist < radius)[0])
+        assert index.within(x, 0.5) == np.any(dist < 0.5)
+        d, dg = defl.deflation_kernel(x, *index.query(x))
+        d_ref, dg_ref = defl.deflation_kernel(x, x_defl, radius)
+        assert np.isclose(d, d_ref) and np.allclose(dg, dg_ref)
+
+
+def test_deflation_deltas():
+    from types import SimpleNamespace
+    from hgdl.deflation_index import deflation_index, replica
+    from hgdl.executors import local_executor
+    from hgdl.local_methods.local_optimizer import shared_data
+    rng = np.random.default_rng(1)
+    x_defl, radius = rng.uniform(-10., 10., (40, 2)), rng.uniform(0.1, 1.0, 40)
+    d = SimpleNamespace(workers={"walkers": [0, 1]}, number_of_walkers=2, chunk_size=1, target_task_time=1.0,
+                        tolerance=1e-6, local_max_iter=20, tolerance_schedule=None, max_iter_schedule=None,
+                        max_time=None, max_evaluations=None, stagnation_epochs=None, stagnation_rank=10)
+    shared = shared_data(local_executor(max_workers=1), d, max_deltas=3)
+    index = deflation_index(2, buffer_size=4)
+    references = []
+    for i in range(0, 40, 5):
+        index.add(x_defl[i:i + 5], radius[i:i + 5])
+        references.append(shared.get_deflation(index))
+    # a new base after max_deltas deltas, otherwise only the new points are sent
+    assert [reference[1] for reference in references] == [1, 1, 1, 1, 2, 2, 2, 2]
+    assert [len(reference[3]) for reference in references] == [0, 1, 2, 3, 0, 1, 2, 3]
+    assert all(len(delta[1]) == 5 for reference in references for delta in reference[3])
+
+    snapshots = [replica(*reference) for reference in references]
+    # an older task of the same base, arriving late, gets the newer copy
+    late = replica(*references[5])
+    index.rebuild(x_defl[0:3], radius[0:3])
+    rebuilt = replica(*shared.get_deflation(index))
+    assert [len(snapshot) for snapshot in snapshots] == list(range(5, 45, 5))
+    assert len(late) == 40 and len(rebuilt) == 3
+    assert np.array_equal(snapshots[-1].x, x_defl) and np.array_equal(snapshots[-1].r, radius)
@@ -0,0 +1,27 @@
+import numpy as np
+from hgdl.hgdl import HGDL
+from hgdl.deflation_index import deflation_index
+from hgdl.meta_data import meta_data
+from hgdl.local_methods.local_optimizer import local_method
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_early_abort():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, local_optimizer="L-BFGS-B", abort_interval=1)
+    a.workers, a.x0, a.tolerance, a.number_of_walkers = {"host": None, "walkers": [0]}, None, 1e-10, 1
+    d = meta_data(a)
+    index = deflation_index(2)
+    index.add(np.array([[420.9687, 420.9687]]), np.array([50.0]))
+    info = {}
+    x, f, g, eig, r, success = local_method({"d": d, "x0": np.array([380.0, 400.0]), "deflation": index,
+                                             "info": info})
+    assert not success and info["aborted"] and info["iterations"] == 1
+
+    info = {}
+    x, f, g, eig, r, success = local_method({"d": d, "x0": np.array([-300.0, -300.0]), "deflation": index,
+                                             "abort value": 0.0, "info": info})
+    assert not success and info["aborted"]
+
+    x, f, g, eig, r, success = local_method({"d": d, "x0": np.array([-300.0, -300.0]), "deflation": index})
+    assert success
@@ -0,0 +1,41 @@
+import numpy as np
+from scipy.optimize import rosen, rosen_der
+from hgdl.hgdl import HGDL
+from hgdl.local_methods.evaluation_cache import evaluation_cache
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_evaluation_cache():
+    calls = []
+
+    def fun_and_grad(x):
+        calls.append(x.copy())
+        return rosen(x), rosen_der(x)
+
+    cache = evaluation_cache(None, None, None, fun_and_grad, size=2)
+    x = np.array([0.5, 0.2])
+    assert cache.func(x) == rosen(x)
+    assert np.allclose(cache.grad(x.copy()), rosen_der(x))
+    assert len(calls) == 1
+    cache.func(x + 1.0)
+    cache.func(x + 2.0)
+    cache.grad(x)
+    assert len(calls) == 4
+
+
+def test_fused_objective():
+    points = []
+
+    def fun_and_grad(x):
+        points.append(np.array(x, dtype=float).tobytes())
+        return schwefel(x), schwefel_gradient(x)
+
+    bounds = np.array([[-500, 500], [-500, 500]])
+    # a cache large enough for all points of a walker, so no point is evicted and evaluated again
+    a = HGDL(fun_and_grad, True, bounds, local_optimizer="L-BFGS-B", num_epochs=2, cache_size=100000)
+    a.optimize(executor="threads", number_of_walkers=1)
+    res = a.get_final()
+    assert len(res) > 0 and len(points) > 0
+    # value and gradient come from one call: as many calls as distinct points
+    assert len(points) == len(set(points))
+    a.kill_client()
@@ -0,0 +1,17 @@
+import numpy as np
+from scipy.optimize import rosen_der, rosen_hess
+from hgdl.finite_differences import finite_difference_hessian
+
+
+def test_finite_difference_hessian():
+    x = np.array([0.3, -0.7, 1.2, 0.5])
+    for method, tol in (("forward", 1e-3), ("central", 1e-6), ("complex", 1e-10)):
+        hess = finite_difference_hessian(rosen_der, method=method)
+        assert np.allclose(hess(x), rosen_hess(x), atol=tol)
+    hess = finite_difference_hessian(rosen_der, threads=3)
+    assert np.allclose(hess(x, grad_x=rosen_der(x)), rosen_hess(x), atol=1e-3)
+
+    def vectorized_der(x): return np.array([rosen_der(point) for point in x])
+    hess = finite_difference_hessian(vectorized_der, method="central", vectorized=True)
+    x = np.array([x, x + 0.1])
+    assert np.allclose(hess(x), [rosen_hess(point) for point in x], atol=1e-6)
@@ -0,0 +1,31 @@
+import numpy as np
+from scipy.optimize import rosen_der, rosen_hess
+from hgdl.hgdl import HGDL
+from hgdl.finite_differences import finite_difference_hessp
+from hgdl.local_methods.hessian_free import extreme_eigenvalues
+
+
+def test_extreme_eigenvalues():
+    x = np.linspace(-0.5, 1.5, 30)
+    hessp = finite_difference_hessp(rosen_der)
+    eig = np.linalg.eigvalsh(rosen_hess(x))
+    assert np.allclose(hessp(x, np.ones(30)), rosen_hess(x) @ np.ones(30), atol=1e-3)
+    assert np.allclose(extreme_eigenvalues(lambda p: hessp(x, p), 30), [eig[0], eig[-1]], rtol=1e-4)
+    assert np.allclose(extreme_eigenvalues(lambda p: rosen_hess(x[0:2]) @ p, 2), np.linalg.eigvalsh(rosen_hess(x[0:2])))
+
+
+def test_lanczos_classification():
+    dim = 40
+    scale = np.linspace(1.0, 4.0, dim)
+
+    def func(x): return np.sum(scale * (x ** 2 - 1.0) ** 2)
+    def grad(x): return 4.0 * scale * x * (x ** 2 - 1.0)
+
+    bounds = np.array([[-2.0, 2.0]] * dim)
+    a = HGDL(func, grad, bounds, local_optimizer="Newton-CG", num_epochs=2, classification="lanczos")
+    a.optimize(executor="threads", number_of_walkers=4, x0=np.ones((4, dim)) * 0.9)
+    res = a.get_final()
+    assert res[0]["classifier"] == "minimum"
+    assert np.allclose(res[0]["Hessian eigvals"][0:2], [8.0, 32.0], rtol=1e-3)
+    assert np.all(np.isnan(res[0]["Hessian eigvals"][2:]))
+    a.kill_client()
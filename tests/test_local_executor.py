@@ -0,0 +1,68 @@
+import numpy as np
+from hgdl.hgdl import HGDL
+from hgdl.executors import local_executor
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_local_executor():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds,
+             global_optimizer="genetic",
+             local_optimizer="L-BFGS-B",
+             num_epochs=5)
+    a.optimize(executor=local_executor(max_workers=2), number_of_walkers=4)
+    res = a.get_final()
+    assert len(res) > 0
+    assert all(res[i]["f(x)"] <= res[i + 1]["f(x)"] for i in range(len(res) - 1))
+    assert len(a.get_latest()) == len(res)
+    a.kill_client()
+
+
+def test_local_executor_steady_state():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds,
+             local_optimizer="L-BFGS-B",
+             num_epochs=5,
+             scheduling="steady state",
+             chunk_size="auto")
+    a.optimize(executor="threads", number_of_walkers=4)
+    res = a.get_final()
+    assert len(res) > 0
+    a.kill_client()
+
+
+def test_local_host_copy():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=3, scheduling="steady state")
+    a.optimize(executor="threads", number_of_walkers=4)
+    client_optima, host_optima = a.optima, a.main_future.result()
+    # the host merges into its own store; the client only sees the published deltas
+    assert host_optima is not client_optima and len(client_optima) == 0
+    assert len(a.get_latest()) == len(host_optima) > 0
+    a.kill_client()
+
+
+def test_steady_state_uses_all_workers(monkeypatch):
+    import threading
+    import time
+    import hgdl.local_methods.local_optimizer as local_optimizer
+    running, peak, lock = [0], [0], threading.Lock()
+    batch = local_optimizer.local_method_batch
+
+    def counted_batch(*args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        try: return batch(*args)
+        finally:
+            with lock: running[0] -= 1
+
+    monkeypatch.setattr(local_optimizer, "local_method_batch", counted_batch)
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=10, scheduling="steady state", chunk_size=4)
+    a.optimize(executor=local_executor(max_workers=8), number_of_walkers=8)
+    assert len(a.get_final()) > 0
+    # 8 walkers in tasks of 4 still keep all 8 workers busy
+    assert peak[0] == 8
+    a.kill_client()
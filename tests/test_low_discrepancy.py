@@ -0,0 +1,34 @@
+import numpy as np
+from scipy.stats import qmc
+from hgdl.hgdl import HGDL
+from hgdl.deflation_index import deflation_index
+from hgdl.global_methods.low_discrepancy import qmc_sampler
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_sequence_continues():
+    bounds = np.array([[-1.0, 1.0], [0.0, 10.0]])
+    sampler = qmc_sampler(bounds, "sobol", seed=3)
+    x = np.vstack([sampler.sample(4), sampler.sample(4)])
+    reference = qmc.scale(qmc.Sobol(2, scramble=True, seed=3).random(8), bounds[:, 0], bounds[:, 1])
+    assert np.allclose(x, reference)
+
+
+def test_deflated_regions_skipped():
+    bounds = np.array([[0.0, 1.0], [0.0, 1.0]])
+    index = deflation_index(2)
+    index.add(np.array([[0.5, 0.5]]), np.array([0.3]))
+    for method in ("sobol", "halton", "lhs"):
+        x = qmc_sampler(bounds, method, seed=0).sample(16, index)
+        assert x.shape == (16, 2)
+        assert not any(index.in_basin(point) for point in x)
+
+
+def test_sobol_global_optimizer():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, global_optimizer="sobol", num_epochs=3)
+    assert a.initial_population == "sobol"
+    a.optimize(executor="threads", number_of_walkers=4)
+    res = a.get_final()
+    a.kill_client()
+    assert len(res) > 0
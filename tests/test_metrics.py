@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from hgdl.hgdl import HGDL
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_metrics():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=3, chunk_size=2, metrics=True)
+    a.optimize(executor="threads", number_of_walkers=4)
+    a.get_final()
+    metrics = a.get_metrics()
+    assert list(metrics["epochs"]["epoch"]) == [0, 1, 2]
+    assert np.sum(metrics["tasks"]["number_of_walkers"]) == len(metrics["walkers"]["task"]) == 12
+    assert np.all(metrics["walkers"]["grad_calls"] > 0) and np.all(metrics["walkers"]["iterations"] >= 0)
+    assert np.sum(metrics["walkers"]["grad_calls"]) == np.sum(metrics["tasks"]["grad_calls"])
+    a.kill_client()
+
+    b = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=1)
+    with pytest.raises(ValueError):
+        b.get_metrics()
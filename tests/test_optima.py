@@ -0,0 +1,53 @@
+import pickle
+
+import numpy as np
+from hgdl.optima import optima
+
+
+def random_results(rng, n, dim):
+    x = rng.uniform(-5., 5., (n, dim))
+    f = rng.integers(0, 20, n).astype(float)
+    g = np.zeros((n, dim))
+    eig = rng.choice([-1., 1.], (n, dim))
+    r = rng.uniform(0.1, 0.5, n)
+    return x, f, g, eig, r, np.ones(n, dtype=bool)
+
+
+def test_optima_merge():
+    rng = np.random.default_rng(1)
+    store = optima(2, 25)
+    f_all = []
+    for epoch in range(10):
+        res = random_results(rng, 7, 2)
+        store.fill_in_optima_list(res)
+        f_all = sorted(f_all + list(res[1]))[0:25]
+        assert np.array_equal(store.f[:store.size], f_all)
+
+    entries = store.list
+    assert len(entries) == 25
+    assert [entry["f(x)"] for entry in entries] == f_all
+    for entry in entries:
+        assert entry["classifier"] in ("minimum", "maximum", "saddle point")
+    defl_x, defl_f, defl_r = store.get_deflation_points(store.size)
+    assert len(store.deflation_index) == len(defl_x) == 25
+
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.size == 25 and np.array_equal(copy.f, store.f[:25])
+    copy.fill_in_optima_list(random_results(rng, 3, 2))
+    assert copy.size == 25
+
+
+def test_optima_delta():
+    rng = np.random.default_rng(2)
+    host, client = optima(3, 30), optima(3, 30)
+    deltas = []
+    for epoch in range(8):
+        host.fill_in_optima_list(random_results(rng, 6, 3))
+        if epoch % 3 == 0: continue
+        deltas.append(host.get_delta())
+    assert host.get_delta() is None
+    for delta in deltas + deltas[-2:]:
+        client.apply_delta(delta)
+    assert client.version == host.version
+    assert np.array_equal(client.f[:client.size], host.f[:host.size])
+    assert np.array_equal(client.x[:client.size], host.x[:host.size])
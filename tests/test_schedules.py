@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from hgdl.hgdl import HGDL
+from hgdl.local_methods.local_optimizer import scheduled
+from hgdl.support_functions import styblinski_tang, styblinski_tang_gradient
+
+
+def test_scheduled():
+    assert scheduled(None, 3, 1e-8) == 1e-8
+    assert scheduled([1e-2, 1e-4], 1, 1e-8) == 1e-4
+    assert scheduled([1e-2, 1e-4], 2, 1e-8) == 1e-8
+    assert scheduled(lambda epoch: 10 * (epoch + 1) if epoch < 2 else None, 1, 1000) == 20
+    assert scheduled(lambda epoch: 10 * (epoch + 1) if epoch < 2 else None, 2, 1000) == 1000
+
+
+@pytest.mark.parametrize("scheduling", ["epoch", "steady state"])
+def test_coarse_to_fine(scheduling):
+    bounds = np.array([[-5, 5], [-5, 5]])
+    a = HGDL(styblinski_tang, styblinski_tang_gradient, bounds, num_epochs=4, scheduling=scheduling,
+             tolerance_schedule=[1e-2, 1e-2], max_iter_schedule=[5, 5])
+    a.optimize(executor="threads", number_of_walkers=4)
+    res = a.get_final()
+    a.kill_client()
+    minima = [entry for entry in res if entry["classifier"] == "minimum"]
+    assert len(minima) > 0 and all(entry["|df/dx|"] < 1e-6 for entry in minima)
@@ -0,0 +1,51 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from hgdl.finite_differences import finite_difference_hessian
+from hgdl.hgdl import HGDL
+from hgdl.stopping import counted
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def run(scheduling="epoch", num_epochs=100000, **kwargs):
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=num_epochs, scheduling=scheduling)
+    a.optimize(executor="threads", number_of_walkers=4, **kwargs)
+    a.get_final()
+    reason = a.get_stop_reason()
+    a.kill_client()
+    return reason
+
+
+@pytest.mark.parametrize("scheduling", ["epoch", "steady state"])
+def test_budgets(scheduling):
+    assert run(scheduling, num_epochs=2) == "num_epochs"
+    assert run(scheduling, max_evaluations=300) == "max_evaluations"
+    assert run(scheduling, stagnation_epochs=3, stagnation_rank=1) == "stagnation"
+    start = time.perf_counter()
+    assert run(scheduling, max_time=1.0) == "max_time"
+    assert time.perf_counter() - start < 5.0
+
+
+def test_counted_callables():
+    d = SimpleNamespace(func=schwefel, grad=schwefel_gradient, hess=finite_difference_hessian(schwefel_gradient),
+                        hessp=None, fun_and_grad=None, vectorized=False)
+    d, counters = counted(d)
+    x = np.array([1.0, 2.0])
+    d.func(x), d.grad(x), d.hess(x)
+    # the forward difference Hessian evaluates the gradient at x and at dim shifted points
+    assert sum(counter.count for counter in counters) == 1 + 1 + 3
+
+
+def test_dNewton_budget():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=100000, local_optimizer="dNewton", metrics=True)
+    a.optimize(executor="threads", number_of_walkers=4, max_evaluations=300)
+    a.get_final()
+    epochs = len(a.get_metrics()["epochs"]["epoch"])
+    reason = a.get_stop_reason()
+    a.kill_client()
+    # gradient and Hessian evaluations count: far fewer than 300 / 4 epochs of 4 walkers
+    assert reason == "max_evaluations" and epochs < 20
@@ -0,0 +1,30 @@
+import asyncio
+
+import numpy as np
+from hgdl.hgdl import HGDL
+from hgdl.support_functions import schwefel, schwefel_gradient
+
+
+def test_on_new_optimum():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    new_optima = []
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=4)
+    a.optimize(executor="threads", number_of_walkers=4, on_new_optimum=new_optima.append)
+    res = a.get_final()
+    a._listener.thread.join(timeout=10)
+    assert sorted(e["f(x)"] for e in new_optima) == [e["f(x)"] for e in res]
+    assert len(a.get_latest()) == len(res)
+    a.kill_client()
+
+
+def test_stream():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, num_epochs=4, scheduling="steady state")
+
+    async def consume():
+        a.optimize(executor="threads", number_of_walkers=4)
+        return [optimum async for optimum in a.stream()]
+
+    streamed = asyncio.run(consume())
+    assert len(streamed) == len(a.get_final()) > 0
+    a.kill_client()
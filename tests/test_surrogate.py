@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from hgdl.hgdl import HGDL
+from hgdl.archive import point_archive, trajectory_recorder
+from hgdl.deflation_index import deflation_index
+from hgdl.global_methods.global_optimizer import tabu_filter
+from hgdl.global_methods.surrogate import surrogate_model
+from hgdl.support_functions import schwefel, schwefel_gradient, styblinski_tang, styblinski_tang_gradient
+
+
+def test_archive_and_recorder():
+    archive = point_archive(2, 10)
+    archive.add(np.arange(24.0).reshape(12, 2), np.arange(12.0))
+    assert len(archive) == 10 and set(archive.f) == set(np.arange(2.0, 12.0))
+
+    recorder = trajectory_recorder(8)
+    func = recorder.wrap(lambda x: float(np.sum(x ** 2)))
+    for i in range(100): func(np.array([i, 0.0]))
+    x, f = recorder.samples(2)
+    assert len(f) < 8 and np.allclose(f, x[:, 0] ** 2)
+
+
+def test_surrogate_proposals():
+    np.random.seed(0)
+    bounds = np.array([[-2.0, 2.0], [-2.0, 2.0]])
+    archive = point_archive(2, 1000)
+    x = np.random.uniform(-2.0, 2.0, size=(200, 2))
+    archive.add(x, np.sum((x - 1.0) ** 2, axis=1))
+    model = surrogate_model(bounds, exploration=0.0)
+    proposals = model.propose(archive, 1)
+    assert np.linalg.norm(proposals[0] - 1.0) < 0.3
+
+    index = deflation_index(2)
+    index.add(np.array([[1.0, 1.0]]), np.array([0.5]))
+    proposals = model.propose(archive, 4, index)
+    assert len(proposals) == 4 and not any(index.in_basin(p) for p in proposals)
+
+
+def test_surrogate_global_optimizer():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, global_optimizer="surrogate", num_epochs=4)
+    a.optimize(executor="threads", number_of_walkers=4)
+    res = a.get_final()
+    a.kill_client()
+    assert len(res) > 0
+
+
+def test_tabu_filter():
+    bounds = np.array([[-500, 500], [-500, 500]])
+    a = HGDL(schwefel, schwefel_gradient, bounds, tabu_radius=50.0, archive_dtype="float32", num_epochs=3)
+    a.optimize(executor="threads", number_of_walkers=4)
+    res = a.get_final()
+    archive = a.meta_data.archive
+    a.kill_client()
+    assert len(res) > 0 and len(archive) > 0 and archive.x.dtype == np.float32
+    assert archive.explored(archive.x[0:1] + 10.0, 50.0)[0]
+    assert not archive.explored(np.array([[1e4, 1e4]]), 50.0)[0]
+
+
+def test_tabu_filter_resamples():
+    np.random.seed(0)
+    archive = point_archive(2, 100)
+    archive.add(np.random.uniform(-10.0, 10.0, size=(100, 2)), np.zeros(100))
+    d = SimpleNamespace(tabu_radius=1.0, archive=archive, sampler=None, bounds=np.array([[-500, 500], [-500, 500]]))
+    inside = archive.x[0:3] + 0.1
+    outside = np.array([[200.0, 200.0], [-300.0, 100.0]])
+    x0 = tabu_filter(d, np.vstack([inside, outside]))
+    assert not np.any(archive.explored(x0, d.tabu_radius))
+    assert not np.any(np.all(np.isclose(x0[0:3], inside), axis=1))
+    assert np.array_equal(x0[3:], outside)
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_dNewton_trajectories(vectorized):
+    func, grad = styblinski_tang, styblinski_tang_gradient
+    if vectorized:
+        func = lambda x: np.array([styblinski_tang(point) for point in x])
+        grad = lambda x: np.array([styblinski_tang_gradient(point) for point in x])
+    bounds = np.array([[-5, 5], [-5, 5]])
+    a = HGDL(func, grad, bounds, local_optimizer="dNewton", vectorized=vectorized, tabu_radius=0.1, num_epochs=2)
+    a.optimize(executor="threads", number_of_walkers=4)
+    a.get_final()
+    archive = a.meta_data.archive
+    a.kill_client()
+    # the Newton iterates are archived, not only the results, with their function values
+    assert len(archive) > 2 * 2 * 4
+    assert np.allclose(archive.f, [styblinski_tang(x) for x in archive.x])
@@ -0,0 +1,37 @@
+import numpy as np
+from hgdl.hgdl import HGDL
+from hgdl.deflation_index import deflation_index
+from hgdl.local_methods import bump_function as defl
+from hgdl.local_methods.dNewton import batched_DNewton
+
+
+def sphere(x):
+    return np.sum((x - 1.0) ** 2, axis=1)
+
+
+def sphere_grad(x):
+    return 2.0 * (x - 1.0)
+
+
+def test_batched_deflation():
+    rng = np.random.default_rng(3)
+    x = rng.uniform(-1., 1., (10, 3))
+    x_defl = rng.uniform(-1., 1., (30, 3))
+    radius = rng.uniform(0.2, 0.8, 30)
+    index = deflation_index(3)
+    index.add(x_defl, radius)
+    d, dg = defl.batched_deflation_kernel(x, *index.query_many(x))
+    for i in range(len(x)):
+        d_ref, dg_ref = defl.deflation_kernel(x[i], x_defl, radius)
+        assert np.isclose(d[i], d_ref) and np.allclose(dg[i], dg_ref)
+
+
+def test_batched_dNewton():
+    bounds = np.array([[-5., 5.]] * 3)
+    a = HGDL(sphere, sphere_grad, bounds, vectorized=True)
+    x0 = np.random.default_rng(4).uniform(-5., 5., (8, 3))
+    hess = a.hess_approx(x0)
+    assert hess.shape == (8, 3, 3) and np.allclose(hess, 2.0 * np.eye(3), atol=1e-4)
+    x, f, g, eig, local_success = batched_DNewton(sphere, sphere_grad, lambda x: np.tile(2.0 * np.eye(3), (len(x), 1, 1)),
+                                                  bounds, x0, 100, 1e-10)
+    assert np.all(local_success) and np.allclose(x, 1.0) and np.allclose(eig, 2.0)
@@ -0,0 +1,94 @@
+import threading
+import time
+import numpy as np
+import pytest
+from dask.distributed import Client, LocalCluster
+from hgdl.hgdl import HGDL
+from hgdl.executors import dask_executor, walker_pool
+from hgdl.support_functions import schwefel, schwefel_gradient, styblinski_tang, styblinski_tang_gradient
+
+
+@pytest.mark.parametrize("host", ["seceded", "client", "worker"])
+def test_dask_executor_hosts(host):
+    client = Client(LocalCluster(n_workers=2, threads_per_worker=1, processes=False, dashboard_address=":0"))
+    a = HGDL(styblinski_tang, styblinski_tang_gradient, np.array([[-5, 5], [-5, 5]]), num_epochs=3)
+    a.optimize(executor=dask_executor(client, host=host))
+    client_optima = a.optima
+    # only a host on a worker of its own takes that worker from the walkers
+    assert a.number_of_walkers == (1 if host == "worker" else 2)
+    assert len(a.get_final()) > 0 and a.get_stop_reason() == "num_epochs"
+    # the host loop has its own optima store, also in the client process or an in-process worker
+    assert a.optima is not client_optima
+    a.kill_client()
+
+
+@pytest.mark.parametrize("host", ["seceded", "client"])
+def test_walker_pool(host):
+    client = Client(LocalCluster(n_workers=2, threads_per_worker=1, processes=False, dashboard_address=":0"))
+    pool = walker_pool(client, host=host)
+    problems = [HGDL(schwefel, schwefel_gradient, np.array([[-500, 500], [-500, 500]]), num_epochs=3),
+                HGDL(styblinski_tang, styblinski_tang_gradient, np.array([[-5, 5], [-5, 5]]), num_epochs=10,
+                     scheduling="steady state"),
+                HGDL(styblinski_tang, styblinski_tang_gradient, np.array([[-5, 5], [-5, 5]]), num_epochs=10)]
+    for problem in problems: problem.optimize(executor=pool.executor(), number_of_walkers=4)
+    results = [problem.get_final() for problem in problems]
+    assert all(len(res) > 0 for res in results)
+    assert all(problem.get_stop_reason() == "num_epochs" for problem in problems)
+    # every problem has its own state on the shared client
+    assert len({problem.break_condition.name for problem in problems}) == len(problems)
+    # the global minimum of styblinski_tang in 2d is -78.33
+    assert min(res[0]["f(x)"] for res in results[1:]) < -78.0
+    for problem in problems: problem.kill_client()
+    assert client.status == "running"
+    pool.close()
+
+
+started, gate = [], threading.Event()
+
+
+def task(name):
+    started.append(name)
+    gate.wait()
+
+
+def test_walker_pool_fairness():
+    client = Client(LocalCluster(n_workers=1, threads_per_worker=1, processes=False, dashboard_address=":0"))
+    pool = walker_pool(client)
+    a, b = pool.executor(), pool.executor()
+    # problem a ran many tasks before; that does not give b precedence over a's waiting tasks
+    gate.set()
+    a.gather([a.submit(task, "old") for i in range(20)])
+    gate.clear()
+    started.clear()
+    tasks = [a.submit(task, "a") for i in range(4)]
+    time.sleep(0.5)
+    tasks += [b.submit(task, "b") for i in range(4)]
+    time.sleep(0.5)
+    gate.set()
+    a.gather(tasks)
+    assert started == ["a", "b"] * 4
+    pool.close()
+
+
+def test_walker_pool_replicas():
+    from types import SimpleNamespace
+    import hgdl.deflation_index as deflation
+    from hgdl.local_methods.local_optimizer import shared_data
+    client = Client(LocalCluster(n_workers=1, threads_per_worker=1, processes=False, dashboard_address=":0"))
+    pool = walker_pool(client)
+    d = SimpleNamespace(workers={"walkers": pool.walkers}, number_of_walkers=1, chunk_size=1, target_task_time=1.0,
+                        tolerance=1e-6, local_max_iter=20, tolerance_schedule=None, max_iter_schedule=None,
+                        max_time=None, max_evaluations=None, stagnation_epochs=None, stagnation_rank=10)
+    # more problems than the 64 deflation sets a worker keeps by default
+    problems = [shared_data(pool.executor(), d) for i in range(100)]
+    index = deflation.deflation_index(2)
+    copies = []
+    for epoch in range(3):
+        index.add(np.full((1, 2), float(epoch)), np.ones(1))
+        client.gather([client.submit(deflation.replica, *shared.get_deflation(index), pure=False)
+                       for shared in problems])
+        # the workers run in this process; every copy is kept and only updated with the new point
+        copies.append([deflation._replicas[shared.deflation_key][1] for shared in problems])
+        assert all(len(copy) == epoch + 1 for copy in copies[-1])
+    assert all(a is b for a, b in zip(copies[0], copies[-1]))
+    client.close()